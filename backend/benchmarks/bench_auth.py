@@ -0,0 +1,55 @@
+"""Time access token checks with a cold and a warm token cache.
+
+Run from the backend directory: python -m benchmarks.bench_auth
+"""
+
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+from config import settings
+from schemas.auth import TokenType, UserRole
+from services.auth import get_token_data
+from utils.auth import create_token, decode_token, token_cache
+
+NUMBER = 20000
+
+settings.JWT_SECRET_KEY = (
+    settings.JWT_SECRET_KEY or "benchmark-secret-key-0123456789abcdef"
+)
+
+now = datetime.now(timezone.utc)
+token = create_token(
+    1,
+    "student@example.com",
+    UserRole.regular.value,
+    now,
+    now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+    TokenType.access,
+)
+credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def cold(check):
+    def run():
+        token_cache.clear()
+        check()
+
+    return run
+
+
+def report(name, check):
+    seconds = timeit.timeit(check, number=NUMBER)
+    print(f"{name:<24} {seconds / NUMBER * 1e6:8.2f} us/call")
+
+
+def main():
+    report("decode_token cold", cold(lambda: decode_token(token)))
+    report("decode_token warm", lambda: decode_token(token))
+    report("get_token_data cold", cold(lambda: get_token_data(credentials)))
+    report("get_token_data warm", lambda: get_token_data(credentials))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Requests per second of GET /api/courses/lesson/{id} against a stub database.
+
+Every query sleeps for LATENCY_SECONDS. The async stub awaits the sleep, like
+the AsyncClient the app uses. The blocking stub sleeps on the event loop, like
+the synchronous client the app used before. The lesson caches are disabled, so
+every request reaches the stub.
+
+Run from the backend directory: python -m benchmarks.bench_lesson_endpoint
+"""
+
+import asyncio
+import contextlib
+import io
+import time
+
+import httpx
+
+from db.database import get_supabase_client
+from main import app
+from schemas.auth import UserResponse, UserRole
+from services.auth import get_student_user
+from services import course
+from utils.cache import LRUCache
+
+LATENCY_SECONDS = 0.02
+REQUESTS = 200
+CONCURRENCY = 50
+LESSON_ID = 1
+
+
+class StubResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class StubQuery:
+    def __init__(self, blocking: bool):
+        self.blocking = blocking
+        self.lesson_id = None
+
+    def select(self, *args):
+        return self
+
+    def eq(self, column, value):
+        self.lesson_id = value
+        return self
+
+    async def execute(self):
+        if self.blocking:
+            time.sleep(LATENCY_SECONDS)
+        else:
+            await asyncio.sleep(LATENCY_SECONDS)
+        return StubResponse(
+            [
+                {
+                    "id": self.lesson_id,
+                    "name": "الدرس",
+                    "module_id": 1,
+                    "created_at": "2025-01-01T00:00:00+00:00",
+                    "activity_id": None,
+                    "is_activity": False,
+                    "assets": [
+                        {"id": 1, "type": "video", "url": "https://example.com/1.mp4"}
+                    ],
+                }
+            ]
+        )
+
+
+class StubClient:
+    def __init__(self, blocking: bool):
+        self.blocking = blocking
+
+    def table(self, name):
+        return StubQuery(self.blocking)
+
+
+student = UserResponse(
+    id=1,
+    email="student@example.com",
+    first_name="Student",
+    last_name="Benchmark",
+    role=UserRole.regular,
+    current_progress_data={"current_progress": 25, "is_final_exam_available": False},
+)
+
+
+async def run(blocking: bool) -> float:
+    supabase = StubClient(blocking)
+    app.dependency_overrides[get_supabase_client] = lambda: supabase
+    app.dependency_overrides[get_student_user] = lambda: student
+
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def request():
+            async with semaphore:
+                response = await client.get(f"/api/courses/lesson/{LESSON_ID}")
+                response.raise_for_status()
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(request() for _ in range(REQUESTS)))
+        elapsed = time.perf_counter() - started_at
+
+    app.dependency_overrides.clear()
+    return REQUESTS / elapsed
+
+
+def main():
+    course.lesson_cache = LRUCache(maxsize=0)
+    course.next_lesson_cache = LRUCache(maxsize=0)
+
+    print(
+        f"{REQUESTS} requests, {CONCURRENCY} concurrent, "
+        f"{LATENCY_SECONDS * 1000:.0f} ms per query"
+    )
+    for name, blocking in (("blocking client", True), ("async client", False)):
+        # The endpoint logs every lesson open
+        with contextlib.redirect_stdout(io.StringIO()):
+            requests_per_second = asyncio.run(run(blocking))
+        print(f"{name:<16} {requests_per_second:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
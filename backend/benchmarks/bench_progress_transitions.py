@@ -0,0 +1,53 @@
+"""Time progress updates after an exam: transition tables vs the old scans.
+
+Run from the backend directory: python -m benchmarks.bench_progress_transitions
+"""
+
+import timeit
+
+from schemas.auth import UserRole
+from schemas.exam import ExamType
+from services.exam import get_progress_after_exam
+from tests.test_progress_transitions import EXAM_IDS, legacy_progress_after_exam
+from utils.course_content import CourseGraph, course_content
+
+NUMBER = 2000
+CASES = [
+    (exam_id, user_role, exam_type)
+    for exam_id in EXAM_IDS
+    for user_role in UserRole
+    for exam_type in ExamType
+]
+CURRENT_PROGRESS = {"current_progress": 0, "is_final_exam_available": False}
+
+
+def run_cases(progress_after_exam):
+    for exam_id, user_role, exam_type in CASES:
+        progress_after_exam(exam_id, user_role, exam_type, CURRENT_PROGRESS)
+
+
+def report(name, seconds, calls):
+    print(f"{name:<28} {seconds / calls * 1e6:8.2f} us/call")
+
+
+def main():
+    calls = NUMBER * len(CASES)
+    report(
+        "transition tables",
+        timeit.timeit(lambda: run_cases(get_progress_after_exam), number=NUMBER),
+        calls,
+    )
+    report(
+        "legacy scans",
+        timeit.timeit(lambda: run_cases(legacy_progress_after_exam), number=NUMBER),
+        calls,
+    )
+    report(
+        "CourseGraph.build",
+        timeit.timeit(lambda: CourseGraph.build(course_content), number=NUMBER),
+        NUMBER,
+    )
+
+
+if __name__ == "__main__":
+    main()
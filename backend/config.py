@@ -10,6 +10,26 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 90
 
+    ANSWER_KEY_CACHE_SIZE: int = 256
+    EXAM_CACHE_SIZE: int = 256
+    EXAM_CACHE_TTL_SECONDS: int = 600
+    COURSE_DETAILS_CACHE_SIZE: int = 64
+    COURSE_DETAILS_CACHE_TTL_SECONDS: int = 600
+    LESSON_CACHE_SIZE: int = 1024
+    LESSON_CACHE_TTL_SECONDS: int = 600
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: int = 60
+    TOKEN_CACHE_SIZE: int = 10000
+    SESSION_CACHE_SIZE: int = 10000
+    SESSION_CACHE_TTL_SECONDS: int = 60
+    SESSION_PURGE_INTERVAL_SECONDS: int = 3600
+    SESSION_PURGE_BATCH_SIZE: int = 500
+    PROGRESS_COMPACT_INTERVAL_SECONDS: int = 300
+    PROGRESS_COMPACT_BATCH_SIZE: int = 1000
+
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
     PRO_ORIGIN: str = Field(validation_alias="PRO_ORIGIN", default="")
     REGULAR_ORIGIN: str = Field(validation_alias="REGULAR_ORIGIN", default="")
 
@@ -1,111 +1,210 @@
-from typing import Any, Dict, List
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, List, Tuple
 
-from fastapi import HTTPException, status
+from fastapi import HTTPException, UploadFile, status
+from pydantic import ValidationError
+from schemas.auth import (
+    StudentImportResponse,
+    StudentImportRow,
+    StudentImportRowResult,
+    UserRole,
+)
+from services.auth import get_registered_roles_by_email, is_registration_eligible
 from schemas.exam import ExamType
-from supabase import Client
+from services.course_graph import reload_course_graphs
+from services.exam import get_answer_key
+from services.progress_events import get_progress_events_page
+from supabase import AsyncClient
+from utils.auth import (
+    create_user_progress,
+    get_password_hashes_async,
+    password_hash_metrics,
+)
 from utils.get_role import get_role_via_origin
 from utils.headers import generate_question_headers
+from utils.exam_report import build_correctness_matrix, generate_report_rows
 from utils.reports import generate_report
-from fastapi.responses import StreamingResponse
+from utils.roster import parse_roster
+from fastapi.responses import JSONResponse, StreamingResponse
 
 
-async def get_users_basic_info_and_exams_controller(
-    origin: str | None, supabase: Client
-) -> List[Dict[str, Any]]:
-    try:
-        role = get_role_via_origin(origin)
+ADMIN_PROGRESS_MAX_PAGE_SIZE = 500
+# Keeps the user_id filter short enough for the URL and each response under
+# PostgREST's row cap
+SUBMISSIONS_USER_CHUNK_SIZE = 50
+SUBMISSIONS_PAGE_SIZE = 1000
 
-        users_response = (
-            supabase.table("users")
-            .select(
-                "id, email, first_name, last_name, current_progress_data, profile_picture"
-            )
-            .eq("role", role.value)
-            .gte("created_at", "2025-11-20 19:28:27.111248+00")
-            .execute()
-        )
 
-        user_ids = [user["id"] for user in users_response.data]
+def build_user_progress_info(
+    user: Dict[str, Any], user_submissions: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    user_id = user["id"]
+    progress_data = user.get("current_progress_data", {})
+    completed_lessons_ids = progress_data.get("completed_lessons", [])
+    current_progress = progress_data.get("current_progress", 0)
+
+    exam_submissions = [
+        {
+            "exam_id": sub["exam_id"],
+            "exam_type": sub["exam_type"],
+            "score": sub["score"],
+        }
+        for sub in user_submissions
+    ]
+
+    pre_exam = next(
+        (
+            sub
+            for sub in user_submissions
+            if sub["exam_type"] == ExamType.PRE_EXAM.value
+        ),
+        None,
+    )
+    final_exam = next(
+        (
+            sub
+            for sub in user_submissions
+            if sub["exam_type"] == ExamType.FINAL_EXAM.value
+        ),
+        None,
+    )
 
-        all_submissions_response = (
+    has_pre_exam = pre_exam is not None
+    pre_exam_score = pre_exam["score"] if pre_exam else None
+    has_final_exam = final_exam is not None
+    final_exam_score = final_exam["score"] if final_exam else None
+
+    return {
+        "user_id": user_id,
+        "email": user["email"],
+        "first_name": user.get("first_name", ""),
+        "last_name": user.get("last_name", ""),
+        "profile_picture": user.get("profile_picture", ""),
+        "completed_lessons_ids": completed_lessons_ids,
+        "current_progress": current_progress,
+        "exam_submissions": exam_submissions,
+        "pre_exam": {
+            "has_pre_exam": has_pre_exam,
+            "score": pre_exam_score,
+        },
+        "final_exam": {
+            "has_final_exam": has_final_exam,
+            "score": final_exam_score,
+        },
+    }
+
+
+async def get_submissions_for_users(
+    user_ids: List[int], supabase: AsyncClient
+) -> List[Dict[str, Any]]:
+    submissions = []
+    offset = 0
+    while True:
+        response = await (
             supabase.table("submissions")
             .select("id, user_id, exam_id, exam_type, score")
             .in_("user_id", user_ids)
+            .order("id")
+            .range(offset, offset + SUBMISSIONS_PAGE_SIZE - 1)
             .execute()
         )
+        submissions.extend(response.data)
+        if len(response.data) < SUBMISSIONS_PAGE_SIZE:
+            return submissions
+        offset += SUBMISSIONS_PAGE_SIZE
+
+
+async def get_users_progress_page(
+    role: UserRole, cursor: int | None, limit: int, supabase: AsyncClient
+) -> Tuple[List[Dict[str, Any]], int | None]:
+    query = (
+        supabase.table("users")
+        .select(
+            "id, email, first_name, last_name, current_progress_data, profile_picture"
+        )
+        .eq("role", role.value)
+        .gte("created_at", "2025-11-20 19:28:27.111248+00")
+    )
+    if cursor is not None:
+        query = query.gt("id", cursor)
+    users_response = await query.order("id").limit(limit).execute()
+    users = users_response.data
+
+    user_ids = [user["id"] for user in users]
+    chunks = [
+        user_ids[i : i + SUBMISSIONS_USER_CHUNK_SIZE]
+        for i in range(0, len(user_ids), SUBMISSIONS_USER_CHUNK_SIZE)
+    ]
+    chunk_results = await asyncio.gather(
+        *(get_submissions_for_users(chunk, supabase) for chunk in chunks)
+    )
+
+    submissions_by_user: Dict[int, List[Dict[str, Any]]] = {}
+    for submissions in chunk_results:
+        for submission in submissions:
+            submissions_by_user.setdefault(submission["user_id"], []).append(submission)
+
+    users_with_info = [
+        build_user_progress_info(user, submissions_by_user.get(user["id"], []))
+        for user in users
+    ]
+    next_cursor = users[-1]["id"] if len(users) == limit else None
+
+    return users_with_info, next_cursor
+
+
+async def iter_users_progress(
+    role: UserRole, supabase: AsyncClient
+) -> AsyncIterator[Dict[str, Any]]:
+    cursor = None
+    while True:
+        users_with_info, cursor = await get_users_progress_page(
+            role, cursor, ADMIN_PROGRESS_MAX_PAGE_SIZE, supabase
+        )
+        for user_info in users_with_info:
+            yield user_info
+        if cursor is None:
+            return
 
-        submissions_by_user = {}
-        for submission in all_submissions_response.data:
-            user_id = submission["user_id"]
-            if user_id not in submissions_by_user:
-                submissions_by_user[user_id] = []
-            submissions_by_user[user_id].append(submission)
-
-        users_with_info = []
-
-        for user in users_response.data:
-            user_id = user["id"]
-            progress_data = user.get("current_progress_data", {})
-            completed_lessons_ids = progress_data.get("completed_lessons", [])
-            current_progress = progress_data.get("current_progress", 0)
-
-            # Get user's exam submissions
-            user_submissions = submissions_by_user.get(user_id, [])
-
-            exam_submissions = [
-                {
-                    "exam_id": sub["exam_id"],
-                    "exam_type": sub["exam_type"],
-                    "score": sub["score"],
-                }
-                for sub in user_submissions
-            ]
-
-            pre_exam = next(
-                (
-                    sub
-                    for sub in user_submissions
-                    if sub["exam_type"] == ExamType.PRE_EXAM.value
-                ),
-                None,
+
+async def stream_users_progress_ndjson(
+    role: UserRole, supabase: AsyncClient
+) -> AsyncIterator[bytes]:
+    async for user_info in iter_users_progress(role, supabase):
+        yield json.dumps(user_info, ensure_ascii=False).encode() + b"\n"
+
+
+async def get_users_basic_info_and_exams_controller(
+    origin: str | None,
+    cursor: int | None,
+    limit: int | None,
+    stream: bool,
+    supabase: AsyncClient,
+):
+    try:
+        role = get_role_via_origin(origin)
+
+        if stream:
+            return StreamingResponse(
+                content=stream_users_progress_ndjson(role, supabase),
+                media_type="application/x-ndjson",
             )
-            final_exam = next(
-                (
-                    sub
-                    for sub in user_submissions
-                    if sub["exam_type"] == ExamType.FINAL_EXAM.value
-                ),
-                None,
+
+        if limit is not None:
+            users_with_info, next_cursor = await get_users_progress_page(
+                role, cursor, limit, supabase
             )
+            headers = {}
+            if next_cursor is not None:
+                headers["X-Next-Cursor"] = str(next_cursor)
+            return JSONResponse(content=users_with_info, headers=headers)
 
-            has_pre_exam = pre_exam is not None
-            pre_exam_score = pre_exam["score"] if pre_exam else None
-            has_final_exam = final_exam is not None
-            final_exam_score = final_exam["score"] if final_exam else None
-
-            user_info = {
-                "user_id": user_id,
-                "email": user["email"],
-                "first_name": user.get("first_name", ""),
-                "last_name": user.get("last_name", ""),
-                "profile_picture": user.get("profile_picture", ""),
-                "completed_lessons_ids": completed_lessons_ids,
-                "current_progress": current_progress,
-                "exam_submissions": exam_submissions,
-                "pre_exam": {
-                    "has_pre_exam": has_pre_exam,
-                    "score": pre_exam_score,
-                },
-                "final_exam": {
-                    "has_final_exam": has_final_exam,
-                    "score": final_exam_score,
-                },
-            }
-
-            users_with_info.append(user_info)
-
-        return users_with_info
+        # Without a page size the whole cohort is returned, fetched page by page
+        return [user_info async for user_info in iter_users_progress(role, supabase)]
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -113,78 +212,48 @@ async def get_users_basic_info_and_exams_controller(
         )
 
 
-async def get_quiz_report_controller(
-    quiz_id: int, supabase: Client, origin: str | None
-):
-    role = get_role_via_origin(origin)
-    pre_question_headers = [
-        "الاسم",
-    ]
-    after_question_headers = [
-        "عدد الاجابات الصحيحة",
-        "عدد اسئلة الاختبار",
-        "النسبة المئوية للطالب",
-        "النسبة المئوية للنجاح",
-        "الحالة",
-    ]
-    report_data = []
-    users_response = (
-        supabase.table("users")
-        .select("*,submissions!inner(*)")
-        .eq("role", role.value)
-        .eq("submissions.exam_id", quiz_id)
-        .gte("created_at", "2025-11-20 19:28:27.111248+00")
-        .execute()
-    )
+REPORT_PRE_QUESTION_HEADERS = [
+    "الاسم",
+]
+REPORT_AFTER_QUESTION_HEADERS = [
+    "عدد الاجابات الصحيحة",
+    "عدد اسئلة الاختبار",
+    "النسبة المئوية للطالب",
+    "النسبة المئوية للنجاح",
+    "الحالة",
+]
 
+
+async def generate_exam_report_response(
+    exam_id: int, users: List[Dict[str, Any]], supabase: AsyncClient
+):
+    answer_key = await get_answer_key(exam_id, supabase)
     questions = (
-        supabase.table("questions")
-        .select("*")
-        .eq("exam_id", quiz_id)
-        .order("id")
-        .execute()
-    ).data
+        sorted(answer_key.review_questions, key=lambda q: q["question_id"])
+        if answer_key
+        else []
+    )
 
     question_headers = generate_question_headers(questions)
-    headers = pre_question_headers + question_headers + after_question_headers
-
-    # generate report data
-    for user in users_response.data:
-        user_data = []
-        score = int(user["submissions"][0]["score"])
-        passing_score = int(user["submissions"][0]["passing_score"])
-        correct_answers = user["submissions"][0]["correct_answers"]
-        number_of_questions = len(questions)
-
-        user_data.append(user["first_name"] + " " + user["last_name"])
-        for question in questions:
-            question_id = question["id"]
-            user_answer = next(
-                (
-                    answer
-                    for answer in user["submissions"][0]["answers"]
-                    if answer["question_id"] == question_id
-                ),
-                None,
-            )
-            if user_answer is None:
-                user_data.append("0")
-            else:
-                is_correct = next(
-                    (
-                        option["is_correct"]
-                        for option in question["options"]
-                        if option["id"] == user_answer["selected_option_id"]
-                    ),
-                    False,
-                )
-                user_data.append("1" if is_correct else "0")
-        user_data.append(correct_answers)
-        user_data.append(number_of_questions)
-        user_data.append(score)
-        user_data.append(passing_score)
-        user_data.append("ناجح" if score >= passing_score else "راسب")
-        report_data.append(user_data)
+    headers = (
+        REPORT_PRE_QUESTION_HEADERS + question_headers + REPORT_AFTER_QUESTION_HEADERS
+    )
+
+    students = [
+        {
+            "name": user["first_name"] + " " + user["last_name"],
+            "submission": user["submissions"][0],
+        }
+        for user in users
+    ]
+    matrix = build_correctness_matrix(
+        questions,
+        answer_key.correct_option_ids if answer_key else {},
+        [student["submission"]["answers"] for student in students],
+    )
+    report_data = generate_report_rows(
+        matrix, students, trailing_columns=len(REPORT_AFTER_QUESTION_HEADERS)
+    )
 
     # generate report
     excel_file = await generate_report(headers, report_data, "Quiz Report")
@@ -204,22 +273,27 @@ async def get_quiz_report_controller(
     )
 
 
+async def get_quiz_report_controller(
+    quiz_id: int, supabase: AsyncClient, origin: str | None
+):
+    role = get_role_via_origin(origin)
+    users_response = await (
+        supabase.table("users")
+        .select("*,submissions!inner(*)")
+        .eq("role", role.value)
+        .eq("submissions.exam_id", quiz_id)
+        .gte("created_at", "2025-11-20 19:28:27.111248+00")
+        .execute()
+    )
+
+    return await generate_exam_report_response(quiz_id, users_response.data, supabase)
+
+
 async def get_exam_report_controller(
-    exam_id: int, exam_type: ExamType, supabase: Client, origin: str | None
+    exam_id: int, exam_type: ExamType, supabase: AsyncClient, origin: str | None
 ):
     role = get_role_via_origin(origin)
-    pre_question_headers = [
-        "الاسم",
-    ]
-    after_question_headers = [
-        "عدد الاجابات الصحيحة",
-        "عدد اسئلة الاختبار",
-        "النسبة المئوية للطالب",
-        "النسبة المئوية للنجاح",
-        "الحالة",
-    ]
-    report_data = []
-    users_response = (
+    users_response = await (
         supabase.table("users")
         .select("*,submissions!inner(*)")
         .eq("role", role.value)
@@ -229,68 +303,152 @@ async def get_exam_report_controller(
         .execute()
     )
 
-    questions = (
-        supabase.table("questions")
-        .select("*")
-        .eq("exam_id", exam_id)
-        .order("id")
-        .execute()
-    ).data
+    return await generate_exam_report_response(exam_id, users_response.data, supabase)
 
-    question_headers = generate_question_headers(questions)
-    headers = pre_question_headers + question_headers + after_question_headers
-
-    # generate report data
-    for user in users_response.data:
-        user_data = []
-        score = int(user["submissions"][0]["score"])
-        passing_score = int(user["submissions"][0]["passing_score"])
-        correct_answers = user["submissions"][0]["correct_answers"]
-        number_of_questions = len(questions)
-
-        user_data.append(user["first_name"] + " " + user["last_name"])
-        for question in questions:
-            question_id = question["id"]
-            user_answer = next(
-                (
-                    answer
-                    for answer in user["submissions"][0]["answers"]
-                    if answer["question_id"] == question_id
-                ),
-                None,
-            )
-            if user_answer is None:
-                user_data.append("0")
-            else:
-                is_correct = next(
-                    (
-                        option["is_correct"]
-                        for option in question["options"]
-                        if option["id"] == user_answer["selected_option_id"]
-                    ),
-                    False,
-                )
-                user_data.append("1" if is_correct else "0")
-        user_data.append(correct_answers)
-        user_data.append(number_of_questions)
-        user_data.append(score)
-        user_data.append(passing_score)
-        user_data.append("ناجح" if score >= passing_score else "راسب")
-        report_data.append(user_data)
 
-    # generate report
-    excel_file = await generate_report(headers, report_data, "Quiz Report")
-    if not excel_file:
-        return HTTPException(
+async def reload_course_graphs_controller(
+    course_id: int | None, supabase: AsyncClient
+) -> Dict[str, Any]:
+    version = await reload_course_graphs(supabase, course_id)
+    return {"message": "Course content reloaded", "version": version}
+
+
+async def get_password_hash_metrics_controller() -> Dict[str, Any]:
+    return password_hash_metrics.snapshot()
+
+
+# A page is only full, and only gets a next cursor, up to PostgREST's row cap
+PROGRESS_EVENTS_MAX_PAGE_SIZE = 1000
+
+
+async def get_progress_events_controller(
+    cursor: int | None, limit: int, user_id: int | None, supabase: AsyncClient
+):
+    try:
+        events, next_cursor = await get_progress_events_page(
+            cursor, limit, supabase, user_id=user_id
+        )
+    except Exception as e:
+        raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error generating report",
+            detail=f"Error fetching progress events: {str(e)}",
         )
-    filename = "student_report.xlsx"
-    return StreamingResponse(
-        content=excel_file,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            "Content-Disposition": f'attachment; filename="{filename}"',
-            "Cache-Control": "no-cache, no-store, must-revalidate",
-        },
+
+    headers = {}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = str(next_cursor)
+    return JSONResponse(content=events, headers=headers)
+
+
+STUDENT_IMPORT_BATCH_SIZE = 500
+
+
+async def import_students_controller(
+    roster_file: UploadFile, origin: str | None, supabase: AsyncClient
+) -> StudentImportResponse:
+    role = get_role_via_origin(origin)
+
+    content = await roster_file.read()
+    records = await asyncio.to_thread(parse_roster, roster_file.filename or "", content)
+
+    results: List[StudentImportRowResult] = []
+    valid_rows: List[Tuple[int, StudentImportRow]] = []
+    seen_emails = set()
+
+    for row_number, record in records:
+        try:
+            student = StudentImportRow(**record)
+        except ValidationError as e:
+            results.append(
+                StudentImportRowResult(
+                    row=row_number,
+                    email=record.get("email", ""),
+                    status="invalid",
+                    detail="; ".join(error["msg"] for error in e.errors()),
+                )
+            )
+            continue
+
+        if student.email in seen_emails:
+            results.append(
+                StudentImportRowResult(
+                    row=row_number,
+                    email=student.email,
+                    status="skipped",
+                    detail="Duplicate email in roster",
+                )
+            )
+            continue
+
+        seen_emails.add(student.email)
+        valid_rows.append((row_number, student))
+
+    # One set-based eligibility check for the whole roster
+    roles_by_email = await get_registered_roles_by_email(
+        [student.email for _, student in valid_rows], supabase
+    )
+
+    eligible_rows = []
+    for row_number, student in valid_rows:
+        if is_registration_eligible(roles_by_email.get(student.email, set()), role):
+            eligible_rows.append((row_number, student))
+        else:
+            results.append(
+                StudentImportRowResult(
+                    row=row_number,
+                    email=student.email,
+                    status="skipped",
+                    detail="الايميل موجد مسبقا",
+                )
+            )
+
+    hashed_passwords = await get_password_hashes_async(
+        [student.password for _, student in eligible_rows]
+    )
+
+    users_to_insert = [
+        {
+            "first_name": student.first_name,
+            "last_name": student.last_name,
+            "email": student.email,
+            "password": hashed_password,
+            "role": role.value,
+            "current_progress_data": create_user_progress(role),
+        }
+        for (_, student), hashed_password in zip(eligible_rows, hashed_passwords)
+    ]
+
+    for i in range(0, len(users_to_insert), STUDENT_IMPORT_BATCH_SIZE):
+        batch_rows = eligible_rows[i : i + STUDENT_IMPORT_BATCH_SIZE]
+        batch_users = users_to_insert[i : i + STUDENT_IMPORT_BATCH_SIZE]
+        try:
+            response = await supabase.table("users").insert(batch_users).execute()
+            user_ids = {user["email"]: user["id"] for user in response.data}
+            for row_number, student in batch_rows:
+                results.append(
+                    StudentImportRowResult(
+                        row=row_number,
+                        email=student.email,
+                        status="created",
+                        user_id=user_ids.get(student.email),
+                    )
+                )
+        except Exception as e:
+            for row_number, student in batch_rows:
+                results.append(
+                    StudentImportRowResult(
+                        row=row_number,
+                        email=student.email,
+                        status="failed",
+                        detail=f"Database error: {str(e)}",
+                    )
+                )
+
+    results.sort(key=lambda result: result.row)
+    return StudentImportResponse(
+        created=sum(result.status == "created" for result in results),
+        skipped=sum(result.status == "skipped" for result in results),
+        invalid=sum(result.status == "invalid" for result in results),
+        failed=sum(result.status == "failed" for result in results),
+        rows=results,
     )
@@ -19,16 +19,21 @@ from schemas.auth import (
 from services.auth import (
     authenticate_user,
     check_registration_eligibility,
-    get_session_by_refresh_token,
     get_user_by_id,
+    invalidate_cached_user,
+)
+from services.sessions import (
+    create_session,
+    delete_session,
+    get_session_by_refresh_token,
 )
-from supabase import Client
-from utils.auth import create_token, create_user_progress, get_password_hash
+from supabase import AsyncClient
+from utils.auth import create_token, create_user_progress, get_password_hash_async
 from utils.get_role import get_role_via_origin
 
 
 async def register_user_controller(
-    user_data: UserRegister, origin: str | None, supabase: Client
+    user_data: UserRegister, origin: str | None, supabase: AsyncClient
 ):
     role = get_role_via_origin(origin)
 
@@ -47,12 +52,12 @@ async def register_user_controller(
             status_code=status.HTTP_400_BAD_REQUEST, detail="الايميل موجد مسبقا"
         )
 
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
 
     progress_data = create_user_progress(role)
 
     try:
-        response = (
+        response = await (
             supabase.table("users")
             .insert(
                 {
@@ -84,7 +89,7 @@ async def register_user_controller(
 
 
 async def login_user_controller(
-    user_credentials: UserLogin, origin: str | None, supabase: Client
+    user_credentials: UserLogin, origin: str | None, supabase: AsyncClient
 ):
     role = get_role_via_origin(origin)
     user = await authenticate_user(
@@ -125,11 +130,7 @@ async def login_user_controller(
         type=TokenType.refresh,
     )
     try:
-        supabase.table("sessions").insert(
-            {
-                "refresh_token": refresh_token,
-            }
-        ).execute()
+        await create_session(refresh_token, refresh_token_expires, supabase)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -143,7 +144,7 @@ async def login_user_controller(
 
 
 async def refresh_token_controller(
-    refresh_request: RefreshTokenRequest, supabase: Client
+    refresh_request: RefreshTokenRequest, supabase: AsyncClient
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -204,8 +205,20 @@ async def refresh_token_controller(
     )
 
 
-async def logout_user_controller(refresh_token: str, supabase: Client):
-    supabase.table("sessions").delete().eq("refresh_token", refresh_token).execute()
+async def logout_user_controller(refresh_token: str, supabase: AsyncClient):
+    try:
+        payload = jwt.decode(
+            refresh_token,
+            settings.JWT_SECRET_KEY,
+            algorithms=[settings.JWT_ALGORITHM],
+            options={"verify_exp": False},
+        )
+        if payload.get("user_id"):
+            invalidate_cached_user(payload["user_id"])
+    except jwt.InvalidTokenError:
+        pass
+
+    await delete_session(refresh_token, supabase)
 
     return {"message": "Logout successful"}
 
@@ -215,7 +228,7 @@ async def update_profile_controller(
     last_name: str | None,
     profile_picture: UploadFile | None,
     current_user: TokenData,
-    supabase: Client,
+    supabase: AsyncClient,
 ):
     user_id = current_user.user_id
     if not user_id:
@@ -267,7 +280,7 @@ async def update_profile_controller(
 
     try:
         # Update user in Supabase
-        response = (
+        response = await (
             supabase.table("users").update(update_data).eq("id", user_id).execute()
         )
 
@@ -277,6 +290,7 @@ async def update_profile_controller(
             )
 
         updated_user = response.data[0]
+        invalidate_cached_user(user_id)
         return {
             "message": "Profile updated successfully",
             "user": {
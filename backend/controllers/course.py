@@ -1,68 +1,51 @@
 from typing import Any, Dict
 
-from fastapi import HTTPException
+from fastapi import BackgroundTasks, HTTPException, Request, Response
 from schemas.auth import UserResponse, UserRole
 from services.course import (
+    get_course_availability,
+    get_course_details_payload,
+    get_next_item,
     get_lesson_by_id,
     get_lesson_with_validation,
     update_progress_after_lesson_completion,
 )
-from supabase import Client
+from supabase import AsyncClient
 from utils.course_content import get_lesson_index, get_next_lesson_index
+from utils.headers import generate_preload_link_header
+from utils.http_cache import payload_response
 
 
-async def get_course_details_controller(course_id: int, supabase: Client):
-    query = (
-        supabase.table("courses")
-        .select(
-            """
-            id,
-            name,
-            exams (
-                id,
-                course_id,
-                created_at
-            ),
-            modules (
-                id,
-                name,
-                lessons (
-                    id,
-                    name,
-                    activity_id,
-                    activity:exams!lessons_activity_id_fkey(
-                    id,
-                    time,
-                    name,
-                    course_id,
-                    module_id,
-                    created_at
-                    )
-                ),
-                quizzes: exams (
-                    id,
-                    module_id,
-                    created_at
-                )
-            )
-            """
-        )
-        .eq("id", course_id)
-        .order("created_at", desc=True, foreign_table="modules.exams")
-        .order("created_at", foreign_table="modules.lessons")
-        .single()
-    )
+async def get_course_details_controller(
+    course_id: int, request: Request, supabase: AsyncClient
+) -> Response:
+    payload = await get_course_details_payload(course_id, supabase)
+
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Course not found")
 
-    response = query.execute()
+    return payload_response(request, payload)
+
+
+async def get_course_availability_controller(
+    course_id: int, student_user: UserResponse
+) -> Dict[str, Any]:
+    availability = get_course_availability(
+        course_id, student_user.current_progress_data
+    )
 
-    if not response.data:
+    if availability is None:
         raise HTTPException(status_code=404, detail="Course not found")
 
-    return response.data
+    return availability
 
 
 async def get_lesson_details_controller(
-    lesson_id: int, student_user: UserResponse, supabase: Client
+    lesson_id: int,
+    student_user: UserResponse,
+    background_tasks: BackgroundTasks,
+    response: Response,
+    supabase: AsyncClient,
 ) -> Dict[str, Any]:
     try:
         result = await get_lesson_with_validation(
@@ -72,7 +55,6 @@ async def get_lesson_details_controller(
             supabase=supabase,
         )
         print(result, "🔥🔥🔥")
-        activity_id = result["lesson"]["activity_id"]
 
         # If there's an error, return it immediately
         if "error" in result:
@@ -104,22 +86,29 @@ async def get_lesson_details_controller(
 
         # return result
 
-        update_result = await update_progress_after_lesson_completion(
-            activity_id=activity_id,
+        # Tell the client what comes next so it can warm the next assets
+        # while the current lesson plays. Resolved before progress is queued,
+        # so a failure here leaves no write behind.
+        next_item = await get_next_item(lesson_id, supabase)
+        result["next_item"] = next_item
+        if next_item and next_item["assets"]:
+            response.headers["Link"] = generate_preload_link_header(next_item["assets"])
+
+        # Lesson opens are read-only unless they advance the student's progress
+        progress_updated = update_progress_after_lesson_completion(
             user_id=student_user.id,
-            user_role=student_user.role,
-            completed_lesson_id=lesson_id,
-            supabase=supabase,
             lesson_id=lesson_id,
+            progress_data=student_user.current_progress_data,
+            supabase=supabase,
+            background_tasks=background_tasks,
         )
 
-        # Add progress update info to the response
-        if "success" in update_result:
-            result["progress_updated"] = True
-            result["progress_message"] = "Progress updated successfully"
-        else:
-            result["progress_updated"] = False
-            result["progress_message"] = "Progress update failed"
+        result["progress_updated"] = progress_updated
+        result["progress_message"] = (
+            "Progress updated successfully"
+            if progress_updated
+            else "Progress already up to date"
+        )
 
         return result
     except Exception as e:
@@ -129,7 +118,7 @@ async def get_lesson_details_controller(
 async def should_update_lesson_progress(
     lesson_id: int,
     student_user: UserResponse,
-    supabase: Client,
+    supabase: AsyncClient,
 ) -> bool:
     user_progress = student_user.current_progress_data
     completed_lessons = user_progress.get("completed_lessons", [])
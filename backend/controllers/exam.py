@@ -1,5 +1,6 @@
 from typing import Any, Dict
 
+from fastapi import Request
 from schemas.auth import UserResponse, UserRole
 from schemas.exam import (
     ExamSubmissionRequest,
@@ -7,27 +8,33 @@ from schemas.exam import (
     ExamType,
     PostExamRequest,
 )
-from services.auth import get_user_progress
+from services.auth import PROGRESS_WRITE_ATTEMPTS
+from services.course_graph import reload_course_graphs
 from services.exam import (
     calculate_exam_score,
-    get_exam_and_questions_by_id,
+    CachedExam,
+    get_cached_exam,
+    get_progress_after_exam,
     insert_exam,
     insert_questions,
+    invalidate_exam,
     is_exam_allowed_by_progress,
-    is_exam_previously_submitted,
-    save_exam_submission,
-    update_progress_after_exam,
+    read_review_snapshot,
+    submit_exam_transaction,
 )
-from supabase import Client
+from supabase import AsyncClient
 from utils.course_content import get_lesson_index
+from utils.http_cache import payload_response
 
 
-async def create_exam_controller(exam_data: PostExamRequest, supabase: Client) -> Any:
+async def create_exam_controller(
+    exam_data: PostExamRequest, supabase: AsyncClient
+) -> Any:
     exam_insert_data = {
         "module_id": exam_data.module_id,
         "course_id": exam_data.course_id,
     }
-    exam_response = insert_exam(supabase, exam_insert_data)
+    exam_response = await insert_exam(supabase, exam_insert_data)
     exam_id = exam_response.data[0]["id"]
 
     questions_to_insert = []
@@ -40,7 +47,10 @@ async def create_exam_controller(exam_data: PostExamRequest, supabase: Client) -
             }
         )
 
-    question_response = insert_questions(supabase, questions_to_insert)
+    question_response = await insert_questions(supabase, questions_to_insert)
+    invalidate_exam(exam_id)
+
+    await reload_course_graphs(supabase)
 
     return {"exam_id": exam_id, "questions": question_response.data}
 
@@ -49,19 +59,14 @@ async def get_exam_controller(
     exam_id: str,
     exam_type: ExamType,
     student_user: UserResponse,
-    supabase: Client,
+    request: Request,
+    supabase: AsyncClient,
 ) -> Any:
-    exam_response = supabase.table("exams").select("*").eq("id", exam_id).execute()
-
-    if not exam_response.data:
-        return {"error": "الاختبار غير موجود"}
-
-    exam_data = exam_response.data[0]
     progress_data = student_user.current_progress_data
 
     # Check if this specific exam type is already submitted
     if exam_type:
-        submission_response = (
+        submission_response = await (
             supabase.table("submissions")
             .select("*")
             .eq("exam_id", exam_id)
@@ -77,17 +82,20 @@ async def get_exam_controller(
             # 1. Prepare detailed_review conditionally
             detailed_review = None
             if exam_type.value != ExamType.PRE_EXAM.value:
-                # Retrieve the saved answers list
-                user_saved_answers = submission.get("answers", [])
+                detailed_review = read_review_snapshot(submission.get("review"))
+
+                if detailed_review is None:
+                    # Retrieve the saved answers list
+                    user_saved_answers = submission.get("answers", [])
 
-                score_recalc_result = await calculate_exam_score(
-                    exam_id=submission["exam_id"],
-                    answers=user_saved_answers,
-                    supabase=supabase,
-                )
+                    score_recalc_result = await calculate_exam_score(
+                        exam_id=submission["exam_id"],
+                        answers=user_saved_answers,
+                        supabase=supabase,
+                    )
 
-                if "error" not in score_recalc_result:
-                    detailed_review = score_recalc_result.get("detailed_review")
+                    if "error" not in score_recalc_result:
+                        detailed_review = score_recalc_result.get("detailed_review")
 
             # 2. Format the submission data into the ExamSubmissionResult structure
             return {
@@ -115,21 +123,30 @@ async def get_exam_controller(
                 },
             }
 
+    cached_exam = await get_cached_exam(exam_id, supabase)
+
+    if cached_exam is None:
+        return {"error": "الاختبار غير موجود"}
+
     if student_user.role == UserRole.pro:
         return await validate_pro_user_getting_exam(
-            exam_data, progress_data, exam_type, supabase
+            cached_exam, progress_data, exam_type, request
         )
     elif student_user.role == UserRole.regular:
         return await validate_regular_user_getting_exam(
-            exam_data, progress_data, exam_type, supabase
+            cached_exam, progress_data, exam_type, request
         )
     else:
         return {"error": "دور المستخدم غير صالح للوصول إلى الاختبار"}
 
 
 async def validate_pro_user_getting_exam(
-    exam_data: dict, progress_data: dict, exam_type: ExamType, supabase: Client
+    cached_exam: CachedExam,
+    progress_data: dict,
+    exam_type: ExamType,
+    request: Request,
 ) -> Any:
+    exam_data = cached_exam.exam
     module_id = exam_data["module_id"]
     exam_id = exam_data["id"]
     exam_index = get_lesson_index(exam_id, "exam")
@@ -143,14 +160,14 @@ async def validate_pro_user_getting_exam(
     if exam_type == ExamType.PRE_EXAM:
         # Pre-exam: must be course-level exam and no progress yet
         if not module_id and next_available_module_id is None:
-            return await get_exam_and_questions_by_id(exam_data["id"], supabase)
+            return payload_response(request, cached_exam.payload)
         else:
             return {"error": "الاختبار القبلي غير متاح. لقد بدأت الكورس بالفعل."}
 
     elif exam_type == ExamType.QUIZ:
         # Quiz: match the next available exam ID
         if exam_index and current_progress and exam_index <= current_progress:
-            return await get_exam_and_questions_by_id(exam_data["id"], supabase)
+            return payload_response(request, cached_exam.payload)
         else:
             return {
                 "error": "للوصول إلى هذا الاختبار، يرجى استكمال الدروس والوحدات السابقة اولًا."
@@ -158,12 +175,12 @@ async def validate_pro_user_getting_exam(
     elif exam_type == ExamType.FINAL_EXAM:
         # Final exam: must be course-level exam and final exam available
         if progress_data.get("is_final_exam_available", False):
-            return await get_exam_and_questions_by_id(exam_data["id"], supabase)
+            return payload_response(request, cached_exam.payload)
         else:
             return {"error": "الاختبار النهائي غير متاح بعد. أكمل جميع الوحدات اولًا."}
     elif exam_type == ExamType.ACTIVITY:
         if exam_index and current_progress and exam_index <= current_progress:
-            return await get_exam_and_questions_by_id(exam_data["id"], supabase)
+            return payload_response(request, cached_exam.payload)
         else:
             return {
                 "error": "للوصول إلى هذا الاختبار، يرجى استكمال الدروس والوحدات السابقة اولًا."
@@ -173,8 +190,12 @@ async def validate_pro_user_getting_exam(
 
 
 async def validate_regular_user_getting_exam(
-    exam_data: dict, progress_data: dict, exam_type: ExamType, supabase: Client
+    cached_exam: CachedExam,
+    progress_data: dict,
+    exam_type: ExamType,
+    request: Request,
 ) -> Any:
+    exam_data = cached_exam.exam
     module_id = exam_data["module_id"]
     current_progress = progress_data.get("current_progress")
     exam_id = exam_data["id"]
@@ -187,14 +208,14 @@ async def validate_regular_user_getting_exam(
     if exam_type == ExamType.PRE_EXAM:
         # Pre-exam: must be course-level exam and no progress yet
         if not module_id and next_available_lesson_id is None:
-            return await get_exam_and_questions_by_id(exam_data["id"], supabase)
+            return payload_response(request, cached_exam.payload)
         else:
             return {"error": "الاختبار القبلي غير متاح. لقد بدأت الكورس بالفعل."}
 
     elif exam_type == ExamType.QUIZ:
         # Quiz: match the next available exam ID
         if exam_index == current_progress:
-            return await get_exam_and_questions_by_id(exam_data["id"], supabase)
+            return payload_response(request, cached_exam.payload)
         else:
             return {
                 "error": "للوصول إلى هذا الاختبار، يرجى استكمال الدروس والوحدات السابقة اولًا."
@@ -202,12 +223,12 @@ async def validate_regular_user_getting_exam(
     elif exam_type == ExamType.FINAL_EXAM:
         # Final exam: must be course-level exam and final exam available
         if progress_data.get("is_final_exam_available", False):
-            return await get_exam_and_questions_by_id(exam_data["id"], supabase)
+            return payload_response(request, cached_exam.payload)
         else:
             return {"error": "الاختبار النهائي غير متاح بعد. أكمل جميع الوحدات اولًا."}
     elif exam_type == ExamType.ACTIVITY:
         if exam_index == current_progress:
-            return await get_exam_and_questions_by_id(exam_data["id"], supabase)
+            return payload_response(request, cached_exam.payload)
         else:
             return {
                 "error": "للوصول إلى هذا الاختبار، يرجى استكمال الدروس والوحدات السابقة اولًا."
@@ -221,22 +242,11 @@ async def submit_exam_controller(
     user_id: int,
     user_role: UserRole,
     user_progress: Dict[str, Any],
-    supabase: Client,
+    supabase: AsyncClient,
 ):
     try:
-        # 1. Check if exam was previously submitted
-        existing_submission = await is_exam_previously_submitted(
-            exam_id=submission_data.exam_id,
-            user_id=user_id,
-            exam_type=submission_data.exam_type,
-            supabase=supabase,
-        )
-
-        if existing_submission:
-            return {"error": "تم تقديم الاختبار بالفعل. لا يمكنك تقديمه مرة أخرى."}
-
         if submission_data.exam_type != ExamType.ACTIVITY:
-            # 2. Check if exam is allowed based on progress data
+            # 1. Check if exam is allowed based on progress data
             is_exam_allowed = await is_exam_allowed_by_progress(
                 exam_id=submission_data.exam_id,
                 exam_type=submission_data.exam_type,
@@ -256,36 +266,43 @@ async def submit_exam_controller(
         if "error" in score_result:
             return {"error": "خطأ في احتساب النتيجة"}
 
-        # 3. Save submission to database with all grade details
-        await save_exam_submission(
-            user_id=user_id,
-            user_role=user_role,
-            exam_id=submission_data.exam_id,
-            exam_type=submission_data.exam_type,
-            answers=submission_data.answers,
-            score=score_result["score"],
-            total_questions=score_result["total_questions"],
-            correct_answers=score_result["correct_answers"],
-            passing_score=score_result["passing_score"],
-            passed=score_result["passed"],
-            supabase=supabase,
-        )
+        # 3. Work out the progress this submission leads to and save it with
+        # the submission in one transaction, rejecting the exam if it was
+        # previously submitted. A version conflict hands back the stored
+        # progress, the new progress is then worked out again from it
+        current_progress = user_progress
+        for _ in range(PROGRESS_WRITE_ATTEMPTS):
+            progress_data = get_progress_after_exam(
+                exam_id=submission_data.exam_id,
+                user_role=user_role,
+                exam_type=submission_data.exam_type,
+                current_progress=current_progress,
+            )
 
-        # 4. Update user progress
-        progress_update_result = await update_progress_after_exam(
-            exam_id=submission_data.exam_id,
-            user_id=user_id,
-            user_role=user_role,
-            exam_type=submission_data.exam_type,
-            current_progress=user_progress,
-            supabase=supabase,
-        )
-        progress_updated = "success" in progress_update_result
+            transaction_result = await submit_exam_transaction(
+                user_id=user_id,
+                user_role=user_role,
+                exam_id=submission_data.exam_id,
+                exam_type=submission_data.exam_type,
+                answers=submission_data.answers,
+                score_result=score_result,
+                current_progress=current_progress,
+                progress_data=progress_data,
+                supabase=supabase,
+            )
+
+            if not transaction_result.get("conflict"):
+                break
+            current_progress = transaction_result["progress"]
+        else:
+            return {"error": "تعذر حفظ التقدم، يرجى المحاولة مرة أخرى."}
+
+        if transaction_result.get("already_submitted"):
+            return {"error": "تم تقديم الاختبار بالفعل. لا يمكنك تقديمه مرة أخرى."}
 
-        # 5. Get updated progress for response
-        updated_progress = await get_user_progress(user_id, supabase)
+        updated_progress = transaction_result.get("progress") or progress_data
 
-        # 6. Prepare the correct answers preview conditionally
+        # 4. Prepare the correct answers preview conditionally
         detailed_review = None
         if submission_data.exam_type != "pre_exam":
             detailed_review = score_result.get("detailed_review")
@@ -296,7 +313,7 @@ async def submit_exam_controller(
             total_questions=score_result["total_questions"],
             correct_answers=score_result["correct_answers"],
             passed=score_result["passed"],
-            progress_updated=progress_updated,
+            progress_updated=True,
             message="Exam submitted successfully",
             next_available_lesson_id=updated_progress.get("next_available_lesson_id"),
             next_available_module_id=updated_progress.get("next_available_module_id"),
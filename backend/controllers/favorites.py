@@ -2,15 +2,15 @@ from typing import Any, Dict, List
 
 from fastapi import HTTPException, status
 from schemas.auth import TokenData
-from supabase import Client
+from supabase import AsyncClient
 
 
 async def toggle_favorite_controller(
-    lesson_id: int, user: TokenData, supabase: Client
+    lesson_id: int, user: TokenData, supabase: AsyncClient
 ) -> Dict[str, Any]:
     try:
         # Check if the lesson exists
-        lesson_check = (
+        lesson_check = await (
             supabase.table("lessons").select("id").eq("id", lesson_id).execute()
         )
         if not lesson_check.data:
@@ -19,7 +19,7 @@ async def toggle_favorite_controller(
             )
 
         # Check if the favorite already exists
-        existing_favorite = (
+        existing_favorite = await (
             supabase.table("favorites")
             .select("id")
             .eq("user_id", user.user_id)
@@ -29,7 +29,7 @@ async def toggle_favorite_controller(
 
         if existing_favorite.data:
             # Favorite exists, so remove it
-            (
+            await (
                 supabase.table("favorites")
                 .delete()
                 .eq("user_id", user.user_id)
@@ -46,7 +46,7 @@ async def toggle_favorite_controller(
             }
         else:
             # Favorite doesn't exist, so add it
-            new_favorite = (
+            new_favorite = await (
                 supabase.table("favorites")
                 .insert({"user_id": user.user_id, "lesson_id": lesson_id})
                 .execute()
@@ -71,9 +71,11 @@ async def toggle_favorite_controller(
         )
 
 
-async def get_favorites_controller(user: TokenData, supabase: Client) -> List[Dict]:
+async def get_favorites_controller(
+    user: TokenData, supabase: AsyncClient
+) -> List[Dict]:
     try:
-        favorites_response = (
+        favorites_response = await (
             supabase.table("favorites")
             .select("*")
             .eq("user_id", user.user_id)
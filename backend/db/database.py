@@ -1,9 +1,16 @@
-from supabase import create_client, Client
+from supabase import AsyncClient, acreate_client
 
 from config import settings
 
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+supabase: AsyncClient | None = None
 
 
-def get_supabase_client() -> Client:
+async def init_supabase_client() -> AsyncClient:
+    global supabase
+    if supabase is None:
+        supabase = await acreate_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
     return supabase
+
+
+async def get_supabase_client() -> AsyncClient:
+    return await init_supabase_client()
@@ -0,0 +1,6 @@
+-- Graded review stored with each submission, so old results are shown
+-- without regrading.
+alter table submissions add column if not exists review jsonb;
+
+create index if not exists submissions_user_exam_type_idx
+    on submissions (user_id, exam_id, exam_type);
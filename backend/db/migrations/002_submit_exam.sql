@@ -0,0 +1,77 @@
+-- Stores a graded submission and the student's new progress in a single
+-- transaction. Called through supabase.rpc("submit_exam", ...).
+create or replace function submit_exam(
+    p_user_id bigint,
+    p_exam_id bigint,
+    p_exam_type text,
+    p_user_role text,
+    p_answers jsonb,
+    p_score numeric,
+    p_total_questions integer,
+    p_correct_answers integer,
+    p_passing_score numeric,
+    p_passed boolean,
+    p_review jsonb,
+    p_progress jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_submission_id bigint;
+begin
+    -- Serialize submissions of the same student so a double submit cannot
+    -- slip past the existence check below.
+    perform pg_advisory_xact_lock(p_user_id);
+
+    if exists (
+        select 1
+        from submissions
+        where user_id = p_user_id
+          and exam_id = p_exam_id
+          and exam_type = p_exam_type
+    ) then
+        return jsonb_build_object('already_submitted', true);
+    end if;
+
+    insert into submissions (
+        user_id,
+        exam_id,
+        user_role,
+        exam_type,
+        answers,
+        score,
+        total_questions,
+        correct_answers,
+        passing_score,
+        passed,
+        review,
+        created_at
+    )
+    values (
+        p_user_id,
+        p_exam_id,
+        p_user_role,
+        p_exam_type,
+        p_answers,
+        p_score,
+        p_total_questions,
+        p_correct_answers,
+        p_passing_score,
+        p_passed,
+        p_review,
+        now()
+    )
+    returning id into v_submission_id;
+
+    update users
+    set current_progress_data = p_progress
+    where id = p_user_id;
+
+    return jsonb_build_object(
+        'already_submitted', false,
+        'submission_id', v_submission_id,
+        'progress', p_progress
+    );
+end;
+$$;
@@ -0,0 +1,13 @@
+-- Sessions are looked up by the SHA-256 digest of the refresh token instead
+-- of the full token. New sessions store only the digest.
+alter table sessions add column if not exists token_hash text;
+
+update sessions
+set token_hash = encode(sha256(convert_to(refresh_token, 'UTF8')), 'hex')
+where token_hash is null
+  and refresh_token is not null;
+
+create unique index if not exists sessions_token_hash_key
+    on sessions (token_hash);
+
+alter table sessions alter column refresh_token drop not null;
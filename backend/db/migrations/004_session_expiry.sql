@@ -0,0 +1,11 @@
+-- Sessions record when their refresh token expires so the sweeper in
+-- services/sessions.py can delete them.
+alter table sessions add column if not exists expires_at timestamptz;
+
+-- Existing sessions get the longest lifetime a refresh token can have.
+update sessions
+set expires_at = now() + interval '90 days'
+where expires_at is null;
+
+create index if not exists sessions_expires_at_idx
+    on sessions (expires_at);
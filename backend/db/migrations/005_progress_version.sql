@@ -0,0 +1,139 @@
+-- current_progress_data carries a "version" counter. Progress changes are
+-- patches of the fields that moved, applied only when the caller saw the
+-- latest version. Both functions return the stored progress, so a caller
+-- that lost the race can retry without reading it again.
+create or replace function apply_progress_patch(
+    p_user_id bigint,
+    p_expected_version integer,
+    p_patch jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_progress jsonb;
+begin
+    update users
+    set current_progress_data = coalesce(current_progress_data, '{}'::jsonb)
+        || p_patch
+        || jsonb_build_object('version', p_expected_version + 1)
+    where id = p_user_id
+      and coalesce((current_progress_data ->> 'version')::integer, 0)
+          = p_expected_version
+    returning current_progress_data into v_progress;
+
+    if found then
+        return jsonb_build_object('applied', true, 'progress', v_progress);
+    end if;
+
+    select coalesce(current_progress_data, '{}'::jsonb)
+    into v_progress
+    from users
+    where id = p_user_id;
+
+    return jsonb_build_object('applied', false, 'progress', v_progress);
+end;
+$$;
+
+drop function if exists submit_exam(
+    bigint, bigint, text, text, jsonb, numeric, integer, integer, numeric,
+    boolean, jsonb, jsonb
+);
+
+-- Same as 002_submit_exam.sql, but the progress is a versioned patch. On a
+-- version conflict nothing is stored and the current progress is returned.
+create or replace function submit_exam(
+    p_user_id bigint,
+    p_exam_id bigint,
+    p_exam_type text,
+    p_user_role text,
+    p_answers jsonb,
+    p_score numeric,
+    p_total_questions integer,
+    p_correct_answers integer,
+    p_passing_score numeric,
+    p_passed boolean,
+    p_review jsonb,
+    p_expected_version integer,
+    p_progress_patch jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_submission_id bigint;
+    v_progress jsonb;
+begin
+    -- Serialize submissions of the same student so a double submit cannot
+    -- slip past the existence check below.
+    perform pg_advisory_xact_lock(p_user_id);
+
+    if exists (
+        select 1
+        from submissions
+        where user_id = p_user_id
+          and exam_id = p_exam_id
+          and exam_type = p_exam_type
+    ) then
+        return jsonb_build_object('already_submitted', true);
+    end if;
+
+    select coalesce(current_progress_data, '{}'::jsonb)
+    into v_progress
+    from users
+    where id = p_user_id
+    for update;
+
+    if coalesce((v_progress ->> 'version')::integer, 0) <> p_expected_version then
+        return jsonb_build_object(
+            'already_submitted', false,
+            'conflict', true,
+            'progress', v_progress
+        );
+    end if;
+
+    insert into submissions (
+        user_id,
+        exam_id,
+        user_role,
+        exam_type,
+        answers,
+        score,
+        total_questions,
+        correct_answers,
+        passing_score,
+        passed,
+        review,
+        created_at
+    )
+    values (
+        p_user_id,
+        p_exam_id,
+        p_user_role,
+        p_exam_type,
+        p_answers,
+        p_score,
+        p_total_questions,
+        p_correct_answers,
+        p_passing_score,
+        p_passed,
+        p_review,
+        now()
+    )
+    returning id into v_submission_id;
+
+    update users
+    set current_progress_data = v_progress
+        || p_progress_patch
+        || jsonb_build_object('version', p_expected_version + 1)
+    where id = p_user_id
+    returning current_progress_data into v_progress;
+
+    return jsonb_build_object(
+        'already_submitted', false,
+        'conflict', false,
+        'submission_id', v_submission_id,
+        'progress', v_progress
+    );
+end;
+$$;
@@ -0,0 +1,185 @@
+-- Append-only log of progress events, written in the same transaction as the
+-- progress change they describe, and per-user snapshots folded from it by
+-- the compactor in services/progress_events.py.
+create table if not exists progress_events (
+    id bigserial primary key,
+    user_id bigint not null references users (id) on delete cascade,
+    event_type text not null,
+    item_id bigint,
+    item_type text,
+    data jsonb not null default '{}'::jsonb,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists progress_events_user_id_idx
+    on progress_events (user_id, id);
+
+create table if not exists progress_snapshots (
+    user_id bigint primary key references users (id) on delete cascade,
+    last_event_id bigint not null,
+    summary jsonb not null default '{}'::jsonb,
+    updated_at timestamptz not null default now()
+);
+
+create index if not exists progress_snapshots_last_event_id_idx
+    on progress_snapshots (last_event_id);
+
+create or replace function insert_progress_events(
+    p_user_id bigint,
+    p_events jsonb
+)
+returns void
+language sql
+as $$
+    insert into progress_events (user_id, event_type, item_id, item_type, data)
+    select
+        p_user_id,
+        event ->> 'event_type',
+        (event ->> 'item_id')::bigint,
+        event ->> 'item_type',
+        coalesce(event -> 'data', '{}'::jsonb)
+    from jsonb_array_elements(coalesce(p_events, '[]'::jsonb)) as event;
+$$;
+
+drop function if exists apply_progress_patch(bigint, integer, jsonb);
+
+-- Same as 005_progress_version.sql, plus the events of the change.
+create or replace function apply_progress_patch(
+    p_user_id bigint,
+    p_expected_version integer,
+    p_patch jsonb,
+    p_events jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_progress jsonb;
+begin
+    update users
+    set current_progress_data = coalesce(current_progress_data, '{}'::jsonb)
+        || p_patch
+        || jsonb_build_object('version', p_expected_version + 1)
+    where id = p_user_id
+      and coalesce((current_progress_data ->> 'version')::integer, 0)
+          = p_expected_version
+    returning current_progress_data into v_progress;
+
+    if found then
+        perform insert_progress_events(p_user_id, p_events);
+        return jsonb_build_object('applied', true, 'progress', v_progress);
+    end if;
+
+    select coalesce(current_progress_data, '{}'::jsonb)
+    into v_progress
+    from users
+    where id = p_user_id;
+
+    return jsonb_build_object('applied', false, 'progress', v_progress);
+end;
+$$;
+
+drop function if exists submit_exam(
+    bigint, bigint, text, text, jsonb, numeric, integer, integer, numeric,
+    boolean, jsonb, integer, jsonb
+);
+
+-- Same as 005_progress_version.sql, plus the events of the submission.
+create or replace function submit_exam(
+    p_user_id bigint,
+    p_exam_id bigint,
+    p_exam_type text,
+    p_user_role text,
+    p_answers jsonb,
+    p_score numeric,
+    p_total_questions integer,
+    p_correct_answers integer,
+    p_passing_score numeric,
+    p_passed boolean,
+    p_review jsonb,
+    p_expected_version integer,
+    p_progress_patch jsonb,
+    p_events jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_submission_id bigint;
+    v_progress jsonb;
+begin
+    -- Serialize submissions of the same student so a double submit cannot
+    -- slip past the existence check below.
+    perform pg_advisory_xact_lock(p_user_id);
+
+    if exists (
+        select 1
+        from submissions
+        where user_id = p_user_id
+          and exam_id = p_exam_id
+          and exam_type = p_exam_type
+    ) then
+        return jsonb_build_object('already_submitted', true);
+    end if;
+
+    select coalesce(current_progress_data, '{}'::jsonb)
+    into v_progress
+    from users
+    where id = p_user_id
+    for update;
+
+    if coalesce((v_progress ->> 'version')::integer, 0) <> p_expected_version then
+        return jsonb_build_object(
+            'already_submitted', false,
+            'conflict', true,
+            'progress', v_progress
+        );
+    end if;
+
+    insert into submissions (
+        user_id,
+        exam_id,
+        user_role,
+        exam_type,
+        answers,
+        score,
+        total_questions,
+        correct_answers,
+        passing_score,
+        passed,
+        review,
+        created_at
+    )
+    values (
+        p_user_id,
+        p_exam_id,
+        p_user_role,
+        p_exam_type,
+        p_answers,
+        p_score,
+        p_total_questions,
+        p_correct_answers,
+        p_passing_score,
+        p_passed,
+        p_review,
+        now()
+    )
+    returning id into v_submission_id;
+
+    update users
+    set current_progress_data = v_progress
+        || p_progress_patch
+        || jsonb_build_object('version', p_expected_version + 1)
+    where id = p_user_id
+    returning current_progress_data into v_progress;
+
+    perform insert_progress_events(p_user_id, p_events);
+
+    return jsonb_build_object(
+        'already_submitted', false,
+        'conflict', false,
+        'submission_id', v_submission_id,
+        'progress', v_progress
+    );
+end;
+$$;
@@ -1,12 +1,14 @@
+import asyncio
 import os
 import sys
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 
 from fastapi.middleware.cors import CORSMiddleware
 from utils.cloudinary import init_cloudinary
 
 sys.path.insert(0, os.path.realpath(os.path.dirname(__file__)))
 
+from db.database import init_supabase_client
 from fastapi import APIRouter, FastAPI
 from routers.admin import admin_router
 from routers.auth import auth_router
@@ -14,12 +16,25 @@ from routers.course import courses_router
 from routers.exam import exam_router
 from routers.favorites import favorites_router
 from routers.notes import notes_router
+from services.course_graph import reload_course_graphs
+from services.progress_events import run_progress_compactor
+from services.sessions import run_session_sweeper
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_cloudinary()
+    supabase = await init_supabase_client()
+    await reload_course_graphs(supabase)
+    background_tasks = [
+        asyncio.create_task(run_session_sweeper(supabase)),
+        asyncio.create_task(run_progress_compactor(supabase)),
+    ]
     yield
+    for task in background_tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
 
 
 app = FastAPI(
@@ -33,7 +48,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"],
+    expose_headers=["Content-Disposition", "X-Next-Cursor"],
 )
 
 api_router = APIRouter(prefix="/api")
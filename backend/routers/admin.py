@@ -1,14 +1,21 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Header
-from supabase import Client
+from fastapi import APIRouter, Depends, File, Header, Query, UploadFile
+from supabase import AsyncClient
 
 from controllers.admin import (
+    ADMIN_PROGRESS_MAX_PAGE_SIZE,
+    PROGRESS_EVENTS_MAX_PAGE_SIZE,
     get_exam_report_controller,
+    get_password_hash_metrics_controller,
+    get_progress_events_controller,
     get_quiz_report_controller,
     get_users_basic_info_and_exams_controller,
+    import_students_controller,
+    reload_course_graphs_controller,
 )
 from db.database import get_supabase_client
+from schemas.auth import StudentImportResponse
 from schemas.exam import ExamType
 from services.auth import validate_admin_user
 
@@ -20,17 +27,33 @@ admin_router = APIRouter(
 
 @admin_router.get("/progress")
 async def get_users_progress(
-    supabase: Client = Depends(get_supabase_client),
+    cursor: int | None = None,
+    limit: int | None = Query(None, ge=1, le=ADMIN_PROGRESS_MAX_PAGE_SIZE),
+    stream: bool = False,
+    supabase: AsyncClient = Depends(get_supabase_client),
     origin: Annotated[str | None, Header()] = None,
     _=Depends(validate_admin_user),
 ):
-    return await get_users_basic_info_and_exams_controller(origin, supabase)
+    return await get_users_basic_info_and_exams_controller(
+        origin, cursor, limit, stream, supabase
+    )
+
+
+@admin_router.get("/progress-events")
+async def get_progress_events(
+    cursor: int | None = None,
+    limit: int = Query(1000, ge=1, le=PROGRESS_EVENTS_MAX_PAGE_SIZE),
+    user_id: int | None = None,
+    supabase: AsyncClient = Depends(get_supabase_client),
+    _=Depends(validate_admin_user),
+):
+    return await get_progress_events_controller(cursor, limit, user_id, supabase)
 
 
 @admin_router.get("/quiz-report")
 async def get_quiz_report(
     quiz_id: int,
-    supabase: Client = Depends(get_supabase_client),
+    supabase: AsyncClient = Depends(get_supabase_client),
     origin: Annotated[str | None, Header()] = None,
     _=Depends(validate_admin_user),
 ):
@@ -41,8 +64,34 @@ async def get_quiz_report(
 async def get_exam_report(
     quiz_id: int,
     exam_type: ExamType,
-    supabase: Client = Depends(get_supabase_client),
+    supabase: AsyncClient = Depends(get_supabase_client),
     origin: Annotated[str | None, Header()] = None,
     _=Depends(validate_admin_user),
 ):
     return await get_exam_report_controller(quiz_id, exam_type, supabase, origin)
+
+
+@admin_router.post("/course-content/reload")
+async def reload_course_content(
+    course_id: int | None = None,
+    supabase: AsyncClient = Depends(get_supabase_client),
+    _=Depends(validate_admin_user),
+):
+    return await reload_course_graphs_controller(course_id, supabase)
+
+
+@admin_router.get("/metrics/password-hashing")
+async def get_password_hash_metrics(
+    _=Depends(validate_admin_user),
+):
+    return await get_password_hash_metrics_controller()
+
+
+@admin_router.post("/students/import", response_model=StudentImportResponse)
+async def import_students(
+    roster_file: UploadFile = File(...),
+    supabase: AsyncClient = Depends(get_supabase_client),
+    origin: Annotated[str | None, Header()] = None,
+    _=Depends(validate_admin_user),
+):
+    return await import_students_controller(roster_file, origin, supabase)
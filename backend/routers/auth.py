@@ -19,7 +19,7 @@ from schemas.auth import (
     UserResponse,
 )
 from services.auth import get_current_user, get_token_data
-from supabase import Client
+from supabase import AsyncClient
 
 auth_router = APIRouter(
     prefix="/auth",
@@ -31,7 +31,7 @@ auth_router = APIRouter(
 async def register_user(
     user_data: UserRegister,
     origin: Annotated[str | None, Header()] = None,
-    supabase: Client = Depends(get_supabase_client),
+    supabase: AsyncClient = Depends(get_supabase_client),
 ):
     return await register_user_controller(user_data, origin, supabase)
 
@@ -40,7 +40,7 @@ async def register_user(
 async def login_user(
     user_credentials: UserLogin,
     origin: Annotated[str | None, Header()] = None,
-    supabase: Client = Depends(get_supabase_client),
+    supabase: AsyncClient = Depends(get_supabase_client),
 ):
     return await login_user_controller(user_credentials, origin, supabase)
 
@@ -48,7 +48,7 @@ async def login_user(
 @auth_router.post("/refresh", response_model=Token)
 async def refresh_token(
     refresh_request: RefreshTokenRequest,
-    supabase: Client = Depends(get_supabase_client),
+    supabase: AsyncClient = Depends(get_supabase_client),
 ):
     return await refresh_token_controller(refresh_request, supabase)
 
@@ -60,7 +60,8 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
 
 @auth_router.post("/logout")
 async def logout_user(
-    request_body: RefreshTokenRequest, supabase: Client = Depends(get_supabase_client)
+    request_body: RefreshTokenRequest,
+    supabase: AsyncClient = Depends(get_supabase_client),
 ):
     return await logout_user_controller(request_body.refresh_token, supabase)
 
@@ -71,7 +72,7 @@ async def update_profile(
     last_name: Optional[str] = Form(None),
     profile_picture: Optional[UploadFile] = File(None),
     current_user: TokenData = Depends(get_token_data),
-    supabase: Client = Depends(get_supabase_client),
+    supabase: AsyncClient = Depends(get_supabase_client),
 ):
     return await update_profile_controller(
         first_name, last_name, profile_picture, current_user, supabase
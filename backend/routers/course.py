@@ -1,12 +1,13 @@
 from controllers.course import (
+    get_course_availability_controller,
     get_course_details_controller,
     get_lesson_details_controller,
 )
 from db.database import get_supabase_client
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends, Request, Response
 from schemas.auth import UserResponse
 from services.auth import get_student_user, validate_student_user
-from supabase import Client
+from supabase import AsyncClient
 
 courses_router = APIRouter(
     prefix="/courses",
@@ -17,16 +18,29 @@ courses_router = APIRouter(
 @courses_router.get("/{course_id}")
 async def get_course_details(
     course_id: int,
-    supabase: Client = Depends(get_supabase_client),
+    request: Request,
+    supabase: AsyncClient = Depends(get_supabase_client),
     _: dict = Depends(validate_student_user),
 ):
-    return await get_course_details_controller(course_id, supabase)
+    return await get_course_details_controller(course_id, request, supabase)
+
+
+@courses_router.get("/{course_id}/availability")
+async def get_course_availability(
+    course_id: int,
+    student_user: UserResponse = Depends(get_student_user),
+):
+    return await get_course_availability_controller(course_id, student_user)
 
 
 @courses_router.get("/lesson/{lesson_id}")
 async def get_lesson_details(
     lesson_id: int,
-    supabase: Client = Depends(get_supabase_client),
+    background_tasks: BackgroundTasks,
+    response: Response,
+    supabase: AsyncClient = Depends(get_supabase_client),
     student_user: UserResponse = Depends(get_student_user),
 ):
-    return await get_lesson_details_controller(lesson_id, student_user, supabase)
+    return await get_lesson_details_controller(
+        lesson_id, student_user, background_tasks, response, supabase
+    )
@@ -4,7 +4,7 @@ from controllers.exam import (
     submit_exam_controller,
 )
 from db.database import get_supabase_client
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 from schemas.auth import UserResponse
 from schemas.exam import (
     ExamSubmissionRequest,
@@ -13,7 +13,7 @@ from schemas.exam import (
     PostExamResponse,
 )
 from services.auth import get_student_user, validate_admin_user
-from supabase import Client
+from supabase import AsyncClient
 
 exam_router = APIRouter(
     prefix="/exam",
@@ -24,7 +24,8 @@ exam_router = APIRouter(
 @exam_router.post("/", response_model=PostExamResponse)
 async def create_exam_endpoint(
     exam_data: PostExamRequest,
-    supabase: Client = Depends(get_supabase_client),
+    supabase: AsyncClient = Depends(get_supabase_client),
+    _=Depends(validate_admin_user),
 ):
     return await create_exam_controller(exam_data, supabase)
 
@@ -32,18 +33,21 @@ async def create_exam_endpoint(
 @exam_router.get("/{exam_id}")
 async def get_exam_endpoint(
     exam_id: str,
+    request: Request,
     exam_type: ExamType = Query(),
     student_user: UserResponse = Depends(get_student_user),
 ):
-    supabase = get_supabase_client()
+    supabase = await get_supabase_client()
 
-    return await get_exam_controller(exam_id, exam_type, student_user, supabase)
+    return await get_exam_controller(
+        exam_id, exam_type, student_user, request, supabase
+    )
 
 
 @exam_router.post("/submit")
 async def submit_exam_endpoint(
     submission_data: ExamSubmissionRequest,
-    supabase: Client = Depends(get_supabase_client),
+    supabase: AsyncClient = Depends(get_supabase_client),
     student_user: UserResponse = Depends(get_student_user),
 ):
     user_id = student_user.id
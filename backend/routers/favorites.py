@@ -7,7 +7,7 @@ from schemas.auth import (
 from services.auth import (
     validate_student_user,
 )
-from supabase import Client
+from supabase import AsyncClient
 
 favorites_router = APIRouter(
     prefix="/favorites",
@@ -19,7 +19,7 @@ favorites_router = APIRouter(
 async def toggle_favorite(
     lesson_id: int,
     user: TokenData = Depends(validate_student_user),
-    supabase: Client = Depends(get_supabase_client),
+    supabase: AsyncClient = Depends(get_supabase_client),
 ):
     return await toggle_favorite_controller(lesson_id, user, supabase)
 
@@ -27,6 +27,6 @@ async def toggle_favorite(
 @favorites_router.get("/")
 async def get_favorites(
     user: TokenData = Depends(validate_student_user),
-    supabase: Client = Depends(get_supabase_client),
+    supabase: AsyncClient = Depends(get_supabase_client),
 ):
     return await get_favorites_controller(user, supabase)
@@ -1,7 +1,7 @@
 from enum import Enum
-from typing import Any, Dict
+from typing import Any, Dict, List
 
-from pydantic import BaseModel, EmailStr, field_validator
+from pydantic import BaseModel, EmailStr, Field, field_validator
 
 
 class UserRole(Enum):
@@ -29,6 +29,29 @@ class UserRegister(BaseModel):
         return v
 
 
+class StudentImportRow(BaseModel):
+    first_name: str = Field(min_length=1)
+    last_name: str = Field(min_length=1)
+    email: EmailStr
+    password: str = Field(min_length=1)
+
+
+class StudentImportRowResult(BaseModel):
+    row: int
+    email: str
+    status: str  # created, skipped, invalid or failed
+    detail: str | None = None
+    user_id: int | None = None
+
+
+class StudentImportResponse(BaseModel):
+    created: int
+    skipped: int
+    invalid: int
+    failed: int
+    rows: List[StudentImportRowResult]
+
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
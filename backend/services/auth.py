@@ -1,5 +1,7 @@
-from typing import Any, Dict
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple
 
+from config import settings
 from db.database import get_supabase_client
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials
@@ -7,13 +9,35 @@ from schemas.auth import (
     UserResponse,
     UserRole,
 )
-from supabase import Client
-from utils.auth import decode_token, security, verify_password
+from supabase import AsyncClient
+from utils.auth import decode_token, security, verify_password_async
+from utils.cache import LRUCache
 
+from services.progress_events import progress_change_events
 
-async def get_user_by_email_and_role(email: str, role: UserRole, supabase: Client):
+# Authenticated users by id, so most requests skip the users lookup. Every
+# write to a user row below updates or drops the cached entry.
+user_cache = LRUCache(
+    maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS
+)
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    user_cache.invalidate(user_id)
+
+
+def update_cached_user_progress(user_id: int, progress_data: Dict[str, Any]) -> None:
+    cached_user = user_cache.get(user_id)
+    if cached_user is None:
+        return
+    user_cache.set(
+        user_id, cached_user.model_copy(update={"current_progress_data": progress_data})
+    )
+
+
+async def get_user_by_email_and_role(email: str, role: UserRole, supabase: AsyncClient):
     try:
-        response = (
+        response = await (
             supabase.table("users")
             .select("*")
             .eq("email", email)
@@ -31,10 +55,12 @@ async def get_user_by_email_and_role(email: str, role: UserRole, supabase: Clien
 
 
 async def check_registration_eligibility(
-    email: str, role: UserRole, supabase: Client
+    email: str, role: UserRole, supabase: AsyncClient
 ) -> bool:
     try:
-        response = supabase.table("users").select("*").eq("email", email).execute()
+        response = (
+            await supabase.table("users").select("*").eq("email", email).execute()
+        )
 
         for existing_user_data in response.data:
             if existing_user_data["role"] == "admin":
@@ -51,27 +77,44 @@ async def check_registration_eligibility(
         )
 
 
-async def get_user_by_id(user_id: int, supabase: Client):
+EMAIL_LOOKUP_CHUNK_SIZE = 200
+
+
+async def get_registered_roles_by_email(
+    emails: List[str], supabase: AsyncClient
+) -> Dict[str, Set[str]]:
+    async def get_chunk(chunk: List[str]):
+        response = await (
+            supabase.table("users").select("email, role").in_("email", chunk).execute()
+        )
+        return response.data
+
     try:
-        response = supabase.table("users").select("*").eq("id", user_id).execute()
-        if response.data:
-            return response.data[0]
-        return None
+        chunks = [
+            emails[i : i + EMAIL_LOOKUP_CHUNK_SIZE]
+            for i in range(0, len(emails), EMAIL_LOOKUP_CHUNK_SIZE)
+        ]
+        results = await asyncio.gather(*(get_chunk(chunk) for chunk in chunks))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Database error: {str(e)}",
+            detail=f"Database error during registration check: {str(e)}",
         )
 
+    roles_by_email: Dict[str, Set[str]] = {}
+    for rows in results:
+        for row in rows:
+            roles_by_email.setdefault(row["email"], set()).add(row["role"])
+    return roles_by_email
+
+
+def is_registration_eligible(roles: Set[str], role: UserRole) -> bool:
+    return "admin" not in roles and role.value not in roles
 
-async def get_session_by_refresh_token(refresh_token: str, supabase: Client):
+
+async def get_user_by_id(user_id: int, supabase: AsyncClient):
     try:
-        response = (
-            supabase.table("sessions")
-            .select("*")
-            .eq("refresh_token", refresh_token)
-            .execute()
-        )
+        response = await supabase.table("users").select("*").eq("id", user_id).execute()
         if response.data:
             return response.data[0]
         return None
@@ -83,12 +126,12 @@ async def get_session_by_refresh_token(refresh_token: str, supabase: Client):
 
 
 async def authenticate_user(
-    email: str, password: str, role: UserRole, supabase: Client
+    email: str, password: str, role: UserRole, supabase: AsyncClient
 ):
     user = await get_user_by_email_and_role(email, role, supabase)
     if not user:
         return False
-    if not verify_password(password, user["password"]):
+    if not await verify_password_async(password, user["password"]):
         return False
 
     user.pop("password")
@@ -118,7 +161,11 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    supabase = get_supabase_client()
+    cached_user = user_cache.get(token_data.user_id)
+    if cached_user is not None:
+        return cached_user.model_copy(deep=True)
+
+    supabase = await get_supabase_client()
 
     user_dict = await get_user_by_id(user_id=token_data.user_id, supabase=supabase)
     if user_dict is None:
@@ -126,10 +173,12 @@ async def get_current_user(
 
     try:
         user_response = UserResponse(**user_dict)
-        return user_response
     except Exception:
         raise credentials_exception
 
+    user_cache.set(user_response.id, user_response)
+    return user_response.model_copy(deep=True)
+
 
 async def validate_student_user(
     token_data=Depends(get_token_data),
@@ -161,14 +210,56 @@ async def validate_admin_user(
     return token_data
 
 
-async def get_user_progress(user_id: int, supabase: Client) -> Dict[str, Any]:
-    response = (
-        supabase.table("users")
-        .select("current_progress_data")
-        .eq("id", user_id)
-        .execute()
-    )
+# current_progress_data carries a version counter, see
+# db/migrations/005_progress_version.sql
+PROGRESS_VERSION_KEY = "version"
+PROGRESS_WRITE_ATTEMPTS = 3
+
+
+def get_progress_version(progress_data: Dict[str, Any]) -> int:
+    return progress_data.get(PROGRESS_VERSION_KEY, 0)
+
+
+def diff_progress(
+    current_progress: Dict[str, Any], updated_progress: Dict[str, Any]
+) -> Dict[str, Any]:
+    return {
+        key: value
+        for key, value in updated_progress.items()
+        if key != PROGRESS_VERSION_KEY
+        and (key not in current_progress or current_progress[key] != value)
+    }
+
+
+async def update_user_progress(
+    user_id: int,
+    current_progress: Dict[str, Any],
+    updated_progress: Dict[str, Any],
+    supabase: AsyncClient,
+    events: Optional[List[Dict[str, Any]]] = None,
+) -> Tuple[bool, Dict[str, Any]]:
+    """Store the fields that moved, if the stored progress is still at the
+    version of ``current_progress``, and log ``events`` with the change.
+
+    Returns whether the update applied and the stored progress, which on a
+    conflict is the newer state to retry against.
+    """
+    patch = diff_progress(current_progress, updated_progress)
+    if not patch:
+        return True, current_progress
+
+    response = await supabase.rpc(
+        "apply_progress_patch",
+        {
+            "p_user_id": user_id,
+            "p_expected_version": get_progress_version(current_progress),
+            "p_patch": patch,
+            "p_events": (events or [])
+            + progress_change_events(current_progress, updated_progress),
+        },
+    ).execute()
 
-    if response.data:
-        return response.data[0].get("current_progress_data", {})
-    return {}
+    result = response.data or {}
+    progress_data = result.get("progress") or {}
+    update_cached_user_progress(user_id, progress_data)
+    return bool(result.get("applied")), progress_data
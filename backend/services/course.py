@@ -1,64 +1,190 @@
-from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Set, Tuple
 
+from config import settings
+from fastapi import BackgroundTasks
 from schemas.auth import UserRole
 from schemas.course import AssetResponse, LessonResponse
-from supabase import Client
-from utils.course_content import get_lesson_index, get_next_lesson_index
+from supabase import AsyncClient
+from utils.cache import LRUCache
+from utils.course_content import (
+    course_graphs,
+    get_lesson_index,
+    get_next_lesson_index,
+)
+from utils.http_cache import PrecompressedPayload
+
+from services.auth import (
+    PROGRESS_WRITE_ATTEMPTS,
+    update_cached_user_progress,
+    update_user_progress,
+)
+from services.progress_events import LESSON_COMPLETED, progress_event
+
+
+# Serialized and compressed course details by course id. Admin edits reload the
+# course graphs and drop these, edits made directly in the database expire.
+course_details_cache = LRUCache(
+    maxsize=settings.COURSE_DETAILS_CACHE_SIZE,
+    ttl=settings.COURSE_DETAILS_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_course_details(course_id: Optional[int] = None) -> None:
+    if course_id is None:
+        course_details_cache.clear()
+    else:
+        course_details_cache.invalidate(course_id)
+
+
+async def get_course_details_payload(
+    course_id: int, supabase: AsyncClient
+) -> Optional[PrecompressedPayload]:
+    cached_payload = course_details_cache.get(course_id)
+    if cached_payload is not None:
+        return cached_payload
+
+    query = (
+        supabase.table("courses")
+        .select(
+            """
+            id,
+            name,
+            exams (
+                id,
+                course_id,
+                created_at
+            ),
+            modules (
+                id,
+                name,
+                lessons (
+                    id,
+                    name,
+                    activity_id,
+                    activity:exams!lessons_activity_id_fkey(
+                    id,
+                    time,
+                    name,
+                    course_id,
+                    module_id,
+                    created_at
+                    )
+                ),
+                quizzes: exams (
+                    id,
+                    module_id,
+                    created_at
+                )
+            )
+            """
+        )
+        .eq("id", course_id)
+        .order("created_at", desc=True, foreign_table="modules.exams")
+        .order("created_at", foreign_table="modules.lessons")
+        .single()
+    )
 
-from services.auth import get_user_progress
+    response = await query.execute()
+    if not response.data:
+        return None
 
+    payload = PrecompressedPayload.build(response.data)
+    course_details_cache.set(course_id, payload)
+    return payload
+
+
+@dataclass(frozen=True)
+class CachedLesson:
+    row: Mapping[str, Any]
+    response: LessonResponse
+
+
+# Lessons with their assets by id. A missing lesson is cached as False, and the
+# next lesson of each lesson is kept alongside, so lesson views and next-lesson
+# lookups are answered from memory. Dropped whenever course content changes.
+lesson_cache = LRUCache(
+    maxsize=settings.LESSON_CACHE_SIZE, ttl=settings.LESSON_CACHE_TTL_SECONDS
+)
+next_lesson_cache = LRUCache(
+    maxsize=settings.LESSON_CACHE_SIZE, ttl=settings.LESSON_CACHE_TTL_SECONDS
+)
+
+
+def invalidate_lessons() -> None:
+    lesson_cache.clear()
+    next_lesson_cache.clear()
+
+
+def build_lesson_response(lesson_dict: Dict[str, Any]) -> LessonResponse:
+    # Convert assets to AssetResponse objects
+    assets = [
+        AssetResponse(id=asset["id"], type=asset["type"], url=asset["url"])
+        for asset in lesson_dict.get("assets", [])
+    ]
+
+    return LessonResponse(
+        id=lesson_dict["id"],
+        name=lesson_dict["name"],
+        module_id=lesson_dict["module_id"],
+        assets=assets,
+        created_at=lesson_dict["created_at"],
+        activity_id=lesson_dict["activity_id"],
+        is_activity=lesson_dict["is_activity"],
+    )
+
+
+async def get_cached_lesson(
+    lesson_id: int | None, supabase: AsyncClient
+) -> Optional[CachedLesson]:
+    cached_lesson = lesson_cache.get(lesson_id)
+    if cached_lesson is not None:
+        return cached_lesson or None
 
-async def get_lesson_by_id(
-    lesson_id: int | None, supabase: Client
-) -> Optional[Dict[str, Any]]:
     try:
-        response = (
+        response = await (
             supabase.table("lessons")
             .select("*, assets(id, type, url)")
             .eq("id", lesson_id)
             .execute()
         )
-        return response.data[0] if response.data else None
     except Exception as e:
         raise Exception(f"Database error: {str(e)}")
 
-
-async def get_first_lesson(supabase: Client) -> Optional[Dict[str, Any]]:
-    try:
-        response = (
-            supabase.table("lessons").select("*").order("created_at").limit(1).execute()
+    lesson_dict = response.data[0] if response.data else None
+    cached_lesson = (
+        CachedLesson(
+            row=MappingProxyType(lesson_dict),
+            response=build_lesson_response(lesson_dict),
         )
-        return response.data[0] if response.data else None
-    except Exception:
-        return None
+        if lesson_dict
+        else None
+    )
+    lesson_cache.set(lesson_id, cached_lesson or False)
+    return cached_lesson
 
 
-async def get_first_lesson_of_module(
-    module_id: int, supabase: Client
+async def get_lesson_by_id(
+    lesson_id: int | None, supabase: AsyncClient
 ) -> Optional[Dict[str, Any]]:
-    try:
-        response = (
-            supabase.table("lessons")
-            .select("*")
-            .eq("module_id", module_id)
-            .order("created_at")
-            .limit(1)
-            .execute()
-        )
-        return response.data[0] if response.data else None
-    except Exception:
-        return None
+    cached_lesson = await get_cached_lesson(lesson_id, supabase)
+    return dict(cached_lesson.row) if cached_lesson else None
 
 
 async def get_next_lesson(
-    current_lesson_id: int | None, supabase: Client
+    current_lesson_id: int | None, supabase: AsyncClient
 ) -> Optional[Dict[str, Any]]:
     try:
-        current_lesson = await get_lesson_by_id(current_lesson_id, supabase)
+        current_lesson = await get_cached_lesson(current_lesson_id, supabase)
         if not current_lesson:
             return None
 
-        response = (
+        next_lesson = next_lesson_cache.get(current_lesson_id)
+        if next_lesson is not None:
+            return next_lesson or None
+
+        response = await (
             supabase.table("lessons")
             .select("id")
             .gt("id", current_lesson_id)
@@ -67,11 +193,37 @@ async def get_next_lesson(
             .execute()
         )
 
-        return response.data[0] if response.data else None
+        next_lesson = response.data[0] if response.data else None
+        next_lesson_cache.set(current_lesson_id, next_lesson or False)
+        return next_lesson
     except Exception:
         return None
 
 
+async def get_next_item(
+    lesson_id: int, supabase: AsyncClient
+) -> Optional[Dict[str, Any]]:
+    graph = course_graphs.for_item(lesson_id, "lesson")
+    next_index = graph.next_index(lesson_id, "lesson") if graph else None
+    if next_index is None:
+        return None
+
+    item = graph.items[next_index]
+    assets = []
+    if item["type"] == "lesson":
+        cached_lesson = await get_cached_lesson(item["id"], supabase)
+        if cached_lesson:
+            assets = [asset.model_dump() for asset in cached_lesson.response.assets]
+
+    return {
+        "index": next_index,
+        "id": item["id"],
+        "type": item["type"],
+        "name": item["name"],
+        "assets": assets,
+    }
+
+
 async def check_pro_user_availability(
     lesson: Dict[str, Any], user_progress: Dict[str, Any]
 ) -> Tuple[bool, str]:
@@ -127,7 +279,7 @@ async def check_regular_user_availability(
 
 
 async def is_lesson_available(
-    lesson: Dict[str, Any],
+    lesson: Mapping[str, Any],
     user_progress: Dict[str, Any],
 ) -> Tuple[bool, str]:
     current_progress = user_progress.get("current_progress")
@@ -150,205 +302,177 @@ async def is_lesson_available(
     #     return await check_regular_user_availability(lesson, user_progress)
 
 
-async def get_lesson_by_activity_id(activity_id: int, supabase: Client):
+def get_course_availability(
+    course_id: int, user_progress: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    graph = course_graphs.get(course_id)
+    if graph is None:
+        return None
+
+    # Same rule as is_lesson_available: everything up to current_progress is
+    # unlocked, nothing is before the pre-exam
+    current_progress = user_progress.get("current_progress")
+    items = [
+        {
+            "index": index,
+            "id": item["id"],
+            "type": item["type"],
+            "name": item["name"],
+            "is_available": current_progress is not None and index <= current_progress,
+            "is_current": index == current_progress,
+        }
+        for index, item in enumerate(graph.items)
+    ]
+
+    return {
+        "course_id": course_id,
+        "current_progress": current_progress,
+        "is_final_exam_available": user_progress.get("is_final_exam_available", False),
+        "message": (
+            "أكمل الاختبار القبلي للبدء في الكورس" if current_progress is None else None
+        ),
+        "items": items,
+    }
+
+
+async def get_exam_by_previous_lesson(
+    lesson_id: int | None, supabase: AsyncClient
+) -> Optional[int]:
     try:
-        response = (
-            supabase.table("lessons")
+        response = await (
+            supabase.table("exams")
             .select("id")
-            .eq("activity_id", activity_id)
+            .eq("previous_lesson", lesson_id)
             .execute()
         )
+
         return response.data[0]["id"] if response.data else None
     except Exception:
         return None
 
 
-async def is_last_activity_in_current_module(activity_id: int, supabase: Client):
-    try:
-        lesson_id = await get_lesson_by_activity_id(activity_id, supabase)
+def get_progress_after_lesson(
+    lesson_id: int, progress_data: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """Progress after opening a lesson, or None when it does not advance."""
+    lesson_index = get_lesson_index(lesson_id, "lesson")
+    next_lesson_index = get_next_lesson_index(lesson_id, "lesson")
+    current_progress = progress_data.get("current_progress")
 
-        if lesson_id is None:
-            return {"lesson_id": lesson_id, "is_last": False}
+    # Re-opening an earlier lesson leaves progress untouched
+    if next_lesson_index is None or lesson_index != current_progress:
+        return None
 
-        # Get the current lesson to find its module
-        current_lesson = await get_lesson_by_id(lesson_id, supabase)
-        if not current_lesson:
-            return {"lesson_id": lesson_id, "is_last": False}
+    return {**progress_data, "current_progress": next_lesson_index}
 
-        module_id = current_lesson.get("module_id")
-        if not module_id:
-            return {"lesson_id": lesson_id, "is_last": False}
 
-        # Get all lessons in this module ordered by creation
-        response = (
-            supabase.table("lessons")
-            .select("id")
-            .eq("module_id", module_id)
-            .order("id")
-            .execute()
+async def save_progress_after_lesson(
+    user_id: int,
+    lesson_id: int,
+    progress_data: Dict[str, Any],
+    supabase: AsyncClient,
+) -> None:
+    # A version conflict hands back the stored progress, so the lesson is
+    # applied again on top of it without another read
+    for _ in range(PROGRESS_WRITE_ATTEMPTS):
+        updated_progress = get_progress_after_lesson(lesson_id, progress_data)
+        if updated_progress is None:
+            return
+
+        applied, progress_data = await update_user_progress(
+            user_id,
+            progress_data,
+            updated_progress,
+            supabase,
+            events=[progress_event(LESSON_COMPLETED, lesson_id, "lesson")],
         )
+        if applied:
+            return
 
-        if not response.data:
-            return {"lesson_id": lesson_id, "is_last": False}
+    print(f"Gave up saving progress of user {user_id} after lesson {lesson_id}")
 
-        lesson_ids = [lesson["id"] for lesson in response.data]
 
-        # Check if this is the last lesson in the module
-        if lesson_id == lesson_ids[-1]:
-            return {"lesson_id": lesson_id, "is_last": True}
-        else:
-            return {"lesson_id": lesson_id, "is_last": False}
+# Latest lesson progress waiting to be written per user. Lesson opens that land
+# while a write is in flight only replace the pending lesson, so there is at
+# most one progress write in flight per user. A user only counts as being
+# written once a flush actually runs, so a flush that never ran (its response
+# failed) is replaced by the next lesson open.
+pending_progress_writes: Dict[int, Tuple[int, Dict[str, Any]]] = {}
+progress_writers: Set[int] = set()
 
-    except Exception:
-        return {"lesson_id": None, "is_last": False}
 
+async def flush_progress_write(user_id: int, supabase: AsyncClient) -> None:
+    if user_id in progress_writers:
+        return
 
-async def get_exam_by_previous_lesson(
-    lesson_id: int | None, supabase: Client
-) -> Optional[int]:
+    progress_writers.add(user_id)
     try:
-        response = (
-            supabase.table("exams")
-            .select("id")
-            .eq("previous_lesson", lesson_id)
-            .execute()
-        )
-
-        return response.data[0]["id"] if response.data else None
-    except Exception:
-        return None
-
-
-async def update_progress_after_lesson_completion(
-    activity_id: int | None,
+        while (pending := pending_progress_writes.get(user_id)) is not None:
+            lesson_id, progress_data = pending
+            try:
+                await save_progress_after_lesson(
+                    user_id, lesson_id, progress_data, supabase
+                )
+            except Exception as e:
+                print(f"Failed to save progress of user {user_id}: {e}")
+            finally:
+                if pending_progress_writes.get(user_id) is pending:
+                    del pending_progress_writes[user_id]
+    finally:
+        progress_writers.discard(user_id)
+
+
+def update_progress_after_lesson_completion(
     user_id: int,
-    user_role: UserRole,
-    completed_lesson_id: int,
-    supabase: Client,
     lesson_id: int,
-) -> Dict[str, Any]:
-    progress_data = await get_user_progress(user_id, supabase)
-    # completed_lessons = progress_data.get("completed_lessons", [])
-
-    # if user_role == UserRole.pro:
-    #     # For PRO users, lessons within a module are freely accessible
-    #     # Progress is mainly module-based
-    #     if completed_lesson_id not in completed_lessons:
-    #         completed_lessons.append(completed_lesson_id)
-    #         progress_data["completed_lessons"] = completed_lessons
-
-    # else:
-    #     # For REGULAR users, linear progression
-    #     if completed_lesson_id not in completed_lessons:
-    #         completed_lessons.append(completed_lesson_id)
-    #         progress_data["completed_lessons"] = completed_lessons
-
-    #     # # Check if this is the last lesson in the current module
-    #     # is_last_lesson_in_module = await is_last_lesson_in_current_module(
-    #     #     completed_lesson_id, supabase
-    #     # )
-
-    #     # if is_last_lesson_in_module:
-    #     #     # Don't update next_available_lesson_id
-    #     #     # Set next_available_exam_id
-    #     #     progress_data["next_available_exam_id"] = await get_exam_by_previous_lesson(
-    #     #         completed_lesson_id, supabase
-    #     #     )
-    #     # TODO: Abdalhameed: (check the submission of activity)
-    #     if activity_id:
-    #         # in case the lesson has an activity
-    #         progress_data["next_available_activity_id"] = activity_id
-    #     else:
-    #         # Normal progression - set next available lesson
-    #         next_lesson_id = await get_next_lesson_id(completed_lesson_id, supabase)
-    #         progress_data["next_available_lesson_id"] = next_lesson_id
-
-    # update current_progress if this is a new lesson
+    progress_data: Dict[str, Any],
+    supabase: AsyncClient,
+    background_tasks: BackgroundTasks,
+) -> bool:
+    updated_progress = get_progress_after_lesson(lesson_id, progress_data)
+    if updated_progress is None:
+        return False
 
-    lesson_index = get_lesson_index(lesson_id, "lesson")
-    next_lesson_index = get_next_lesson_index(lesson_id, "lesson")
-    current_progress = progress_data.get("current_progress")
+    # The cached user sees the new progress right away, the database write
+    # happens once the response has been sent
+    update_cached_user_progress(user_id, updated_progress)
 
-    if next_lesson_index is not None and lesson_index == current_progress:
-        progress_data["current_progress"] = next_lesson_index
-    print(
-        next_lesson_index,
-        "🚀🚀",
-    )
-    # Save progress
-    supabase.table("users").update({"current_progress_data": progress_data}).eq(
-        "id", user_id
-    ).execute()
+    pending_progress_writes[user_id] = (lesson_id, progress_data)
+    if user_id not in progress_writers:
+        background_tasks.add_task(flush_progress_write, user_id, supabase)
 
-    return {"success": True}
+    return True
 
 
 async def get_lesson_with_validation(
     lesson_id: int,
     user_role: UserRole,
     user_progress: Dict[str, Any],
-    supabase: Client,
+    supabase: AsyncClient,
 ) -> Dict[str, Any]:
     try:
-        # Get lesson details as dictionary from DB
-        lesson_dict = await get_lesson_by_id(lesson_id, supabase)
-        if not lesson_dict:
+        # Get the lesson and its prebuilt response from the lesson cache
+        cached_lesson = await get_cached_lesson(lesson_id, supabase)
+        if not cached_lesson:
             return {"error": "الدرس غير موجود"}
 
         # Check if lesson is available
-        is_available, message = await is_lesson_available(lesson_dict, user_progress)
+        is_available, message = await is_lesson_available(
+            cached_lesson.row, user_progress
+        )
 
         if not is_available:
             return {"error": message}
 
-        # Convert assets to AssetResponse objects
-        assets_data = lesson_dict.get("assets", [])
-        assets = []
-        for asset in assets_data:
-            asset_response = AssetResponse(
-                id=asset["id"], type=asset["type"], url=asset["url"]
-            )
-            assets.append(asset_response)
-
-        # Convert to LessonResponse for final response
-        lesson_obj = LessonResponse(
-            id=lesson_dict["id"],
-            name=lesson_dict["name"],
-            module_id=lesson_dict["module_id"],
-            assets=assets,
-            created_at=lesson_dict["created_at"],
-            activity_id=lesson_dict["activity_id"],
-            is_activity=lesson_dict["is_activity"],
-        )
-
         # Return lesson data
-        return {"lesson": lesson_obj.model_dump(), "message": message}
+        return {"lesson": cached_lesson.response.model_dump(), "message": message}
 
     except Exception as e:
         return {"error": f"Error retrieving lesson: {str(e)}"}
 
 
-async def is_module_completed(
-    module_id: int, completed_lessons: List[int], supabase: Client
-) -> bool:
-    try:
-        response = (
-            supabase.table("lessons").select("id").eq("module_id", module_id).execute()
-        )
-
-        module_lesson_ids = (
-            [lesson["id"] for lesson in response.data] if response.data else []
-        )
-
-        # Check if all module lessons are in completed_lessons
-        return all(lesson_id in completed_lessons for lesson_id in module_lesson_ids)
-
-    except Exception:
-        return False
-
-
 async def get_next_lesson_id(
-    current_lesson_id: int | None, supabase: Client
+    current_lesson_id: int | None, supabase: AsyncClient
 ) -> Optional[int]:
     try:
         next_lesson = await get_next_lesson(current_lesson_id, supabase)
@@ -357,30 +481,14 @@ async def get_next_lesson_id(
         return None
 
 
-async def get_first_exam_for_module(module_id: int, supabase: Client) -> Optional[int]:
-    try:
-        response = (
-            supabase.table("exams")
-            .select("id")
-            .eq("module_id", module_id)
-            .order("created_at")
-            .limit(1)
-            .execute()
-        )
-
-        return response.data[0]["id"] if response.data else None
-    except Exception:
-        return None
-
-
 async def get_first_exam_after_lesson(
-    lesson_id: int, supabase: Client
+    lesson_id: int, supabase: AsyncClient
 ) -> Optional[int]:
     """Get the first exam ID that comes after a lesson"""
     try:
         # This depends on your exam structure - you might need to adjust this
         # One approach: get exams that have this lesson as previous_lesson
-        response = (
+        response = await (
             supabase.table("exams")
             .select("id")
             .eq("previous_lesson", lesson_id)
@@ -392,18 +500,3 @@ async def get_first_exam_after_lesson(
         return response.data[0]["id"] if response.data else None
     except Exception:
         return None
-
-
-async def is_last_module(module_id: int, supabase: Client) -> bool:
-    try:
-        response = supabase.table("modules").select("id").order("id").execute()
-
-        if not response.data:
-            return True  # No modules, so technically this is the "last"
-
-        module_ids = [module["id"] for module in response.data]
-        max_module_id = max(module_ids) if module_ids else 0
-
-        return module_id >= max_module_id
-    except Exception:
-        return False
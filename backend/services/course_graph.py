@@ -0,0 +1,147 @@
+from typing import Any, Dict, List, Optional
+
+from supabase import AsyncClient
+from utils.course_content import (
+    CourseGraph,
+    course_graphs,
+)
+from utils.course_index import ordered_rows, publish_course_index
+
+from services.course import invalidate_course_details, invalidate_lessons
+from services.exam import invalidate_exam
+
+COURSE_GRAPH_QUERY = """
+    id,
+    modules (
+        id,
+        created_at,
+        lessons (
+            id,
+            name,
+            activity_id,
+            created_at,
+            activity:exams!lessons_activity_id_fkey(
+                id,
+                name
+            )
+        ),
+        exams (
+            id,
+            name,
+            created_at
+        )
+    )
+"""
+
+
+def build_course_content(course: Dict[str, Any]) -> List[Dict[str, Any]]:
+    content: List[Dict[str, Any]] = []
+    quiz_indexes: List[int] = []
+
+    for module in ordered_rows(course.get("modules")):
+        activity_ids = set()
+
+        # Lessons in creation order, each followed by its activity exam
+        for lesson in ordered_rows(module.get("lessons")):
+            content.append(
+                {"id": lesson["id"], "type": "lesson", "name": lesson["name"]}
+            )
+
+            activity = lesson.get("activity")
+            if lesson.get("activity_id") and activity:
+                activity_ids.add(activity["id"])
+                content.append(
+                    {"id": activity["id"], "type": "exam", "name": activity["name"]}
+                )
+
+        # The remaining module exams are the module quizzes, closing the module
+        for exam in ordered_rows(module.get("exams")):
+            if exam["id"] in activity_ids:
+                continue
+            quiz_indexes.append(len(content))
+            content.append(
+                {
+                    "id": exam["id"],
+                    "type": "exam",
+                    "name": exam["name"],
+                    "is_quiz": True,
+                }
+            )
+
+    # Pro students jump from one module quiz to the next
+    for quiz_index, next_quiz_index in zip(quiz_indexes, quiz_indexes[1:]):
+        content[quiz_index]["next_exam_index"] = next_quiz_index
+
+    return content
+
+
+def _layout(graph: CourseGraph) -> List[tuple]:
+    return [
+        (item["id"], item["type"], item.get("is_quiz", False)) for item in graph.items
+    ]
+
+
+def _extends_layout(current: CourseGraph, graph: CourseGraph) -> bool:
+    """Whether ``graph`` only appends items to the layout of ``current``."""
+    if _layout(graph)[: len(current)] != _layout(current):
+        return False
+
+    # The last quiz of the current layout may now link to an appended one
+    for old_item, new_item in zip(current.items, graph.items):
+        old_next = old_item.get("next_exam_index")
+        new_next = new_item.get("next_exam_index")
+        if old_next != new_next and not (old_next is None and new_next >= len(current)):
+            return False
+
+    return True
+
+
+async def load_course_graphs(
+    supabase: AsyncClient, course_id: Optional[int] = None
+) -> int:
+    query = supabase.table("courses").select(COURSE_GRAPH_QUERY)
+    if course_id is not None:
+        query = query.eq("id", course_id)
+    response = await query.execute()
+
+    graphs: Dict[int, CourseGraph] = {}
+    modules_by_course: Dict[int, List[Dict[str, Any]]] = {}
+    for course in response.data or []:
+        content = build_course_content(course)
+        if not content:
+            continue
+
+        graph = CourseGraph.build(content)
+
+        # current_progress is stored as an index into the course layout, so a
+        # course that is already loaded only accepts items appended to it
+        current = course_graphs.get(course["id"])
+        if current and not _extends_layout(current, graph):
+            print(
+                f"Course {course['id']} layout in the database reorders or removes "
+                "items of the loaded layout, keeping the loaded layout."
+            )
+            continue
+
+        graphs[course["id"]] = graph
+        modules_by_course[course["id"]] = course.get("modules") or []
+
+    # Courses whose layout was skipped keep their previous index too, so the
+    # index never disagrees with the published graphs
+    publish_course_index(modules_by_course)
+    return course_graphs.publish(graphs)
+
+
+async def reload_course_graphs(
+    supabase: AsyncClient, course_id: Optional[int] = None
+) -> int:
+    # Content changed, so everything derived from it is rebuilt on next use
+    invalidate_course_details(course_id)
+    invalidate_lessons()
+    invalidate_exam()
+
+    try:
+        return await load_course_graphs(supabase, course_id)
+    except Exception as e:
+        print(f"Failed to reload course graphs: {e}")
+        return course_graphs.version
@@ -1,37 +1,55 @@
-from datetime import datetime
-from typing import Any, Dict, List
+import asyncio
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
+from config import settings
 from schemas.auth import UserRole
 from schemas.exam import ExamType
-from supabase import Client
-from utils.course_content import get_exam_by_id, get_lesson_index, get_next_lesson_index
+from supabase import AsyncClient
+from utils.cache import LRUCache
+from utils.course_content import (
+    DEFAULT_COURSE_ID,
+    get_lesson_index,
+    get_progress_transitions,
+)
+from utils.http_cache import PrecompressedPayload
 
-from services.course import (
-    get_first_exam_for_module,
-    get_next_lesson_id,
-    is_last_module,
+from services.auth import (
+    diff_progress,
+    get_progress_version,
+    update_cached_user_progress,
+)
+from services.progress_events import (
+    EXAM_SUBMITTED,
+    progress_change_events,
+    progress_event,
 )
 
 
-def insert_exam(supabase: Client, exam_data: Dict[str, Any]):
-    return supabase.table("exams").insert(exam_data).execute()
+async def insert_exam(supabase: AsyncClient, exam_data: Dict[str, Any]):
+    return await supabase.table("exams").insert(exam_data).execute()
 
 
-def insert_questions(supabase: Client, questions_to_insert: List[Dict[str, Any]]):
-    return supabase.table("questions").insert(questions_to_insert).execute()
+async def insert_questions(
+    supabase: AsyncClient, questions_to_insert: List[Dict[str, Any]]
+):
+    return await supabase.table("questions").insert(questions_to_insert).execute()
 
 
 async def get_exam_and_questions_by_id(
-    exam_id: str, supabase: Client
+    exam_id: str, supabase: AsyncClient
 ) -> Dict[str, Any]:
-    exam_response = supabase.table("exams").select("*").eq("id", exam_id).execute()
+    exam_response = (
+        await supabase.table("exams").select("*").eq("id", exam_id).execute()
+    )
 
     if not exam_response.data:
         return {}
 
     exam_data = exam_response.data[0]
 
-    questions_response = (
+    questions_response = await (
         supabase.table("questions").select("*").eq("exam_id", exam_id).execute()
     )
 
@@ -53,23 +71,148 @@ async def get_exam_and_questions_by_id(
     return exam_data
 
 
+@dataclass(frozen=True)
+class CachedExam:
+    exam: Mapping[str, Any]
+    payload: PrecompressedPayload
+
+
+# Exam rows with their sanitized questions, serialized once per exam. Loads in
+# flight are shared, so a class opening the same exam at once costs a single
+# fetch. The generation guards against caching a load that an edit overtook.
+exam_cache = LRUCache(
+    maxsize=settings.EXAM_CACHE_SIZE, ttl=settings.EXAM_CACHE_TTL_SECONDS
+)
+exam_loads: Dict[str, "asyncio.Task[Optional[CachedExam]]"] = {}
+exam_cache_generation = 0
+
+
+def invalidate_exam(exam_id: Optional[int] = None) -> None:
+    global exam_cache_generation
+    exam_cache_generation += 1
+
+    if exam_id is None:
+        exam_cache.clear()
+        exam_loads.clear()
+        answer_keys.clear()
+    else:
+        exam_cache.invalidate(str(exam_id))
+        exam_loads.pop(str(exam_id), None)
+        invalidate_answer_key(exam_id)
+
+
+async def load_exam(exam_id: str, supabase: AsyncClient) -> Optional[CachedExam]:
+    generation = exam_cache_generation
+    exam_data = await get_exam_and_questions_by_id(exam_id, supabase)
+    if not exam_data:
+        return None
+
+    cached_exam = CachedExam(
+        exam=MappingProxyType(
+            {key: value for key, value in exam_data.items() if key != "questions"}
+        ),
+        payload=PrecompressedPayload.build(exam_data),
+    )
+    if generation == exam_cache_generation:
+        exam_cache.set(exam_id, cached_exam)
+    return cached_exam
+
+
+async def get_cached_exam(
+    exam_id: int | str, supabase: AsyncClient
+) -> Optional[CachedExam]:
+    exam_id = str(exam_id)
+    cached_exam = exam_cache.get(exam_id)
+    if cached_exam is not None:
+        return cached_exam
+
+    load = exam_loads.get(exam_id)
+    if load is None:
+        load = asyncio.create_task(load_exam(exam_id, supabase))
+        exam_loads[exam_id] = load
+        load.add_done_callback(
+            lambda task: (
+                exam_loads.pop(exam_id, None)
+                if exam_loads.get(exam_id) is task
+                else None
+            )
+        )
+
+    # A cancelled request must not cancel the load other requests wait on
+    return await asyncio.shield(load)
+
+
+@dataclass(frozen=True)
+class AnswerKey:
+    exam_id: int
+    question_ids: Tuple[int, ...]
+    correct_option_ids: Mapping[int, Optional[int]]
+    review_questions: Tuple[Dict[str, Any], ...]
+
+
+answer_keys = LRUCache(maxsize=settings.ANSWER_KEY_CACHE_SIZE)
+
+
+def invalidate_answer_key(exam_id: int) -> None:
+    answer_keys.invalidate(exam_id)
+
+
+async def get_answer_key(exam_id: int, supabase: AsyncClient) -> Optional[AnswerKey]:
+    answer_key = answer_keys.get(exam_id)
+    if answer_key is not None:
+        return answer_key
+
+    # Fetch question details: ID, text, and the options array (which contains the correct flag)
+    response = await (
+        supabase.table("questions")
+        .select("id, question_text, options")
+        .eq("exam_id", exam_id)
+        .execute()
+    )
+
+    if not response.data:
+        return None
+
+    correct_option_ids: Dict[int, Optional[int]] = {}
+    review_questions = []
+    for question in response.data:
+        all_options = question.get("options", [])
+
+        # Find the correct option using the 'is_correct' flag in the options array
+        correct_option = next(
+            (opt for opt in all_options if opt.get("is_correct") is True), None
+        )
+        correct_option_ids[question["id"]] = (
+            correct_option["id"] if correct_option else None
+        )
+        review_questions.append(
+            {
+                "question_id": question["id"],
+                "question_text": question.get("question_text", "N/A"),
+                "options": all_options,
+            }
+        )
+
+    answer_key = AnswerKey(
+        exam_id=exam_id,
+        question_ids=tuple(correct_option_ids),
+        correct_option_ids=MappingProxyType(correct_option_ids),
+        review_questions=tuple(review_questions),
+    )
+    answer_keys.set(exam_id, answer_key)
+    return answer_key
+
+
 async def calculate_exam_score(
-    exam_id: int, answers: List[Dict[str, Any]], supabase: Client
+    exam_id: int, answers: List[Dict[str, Any]], supabase: AsyncClient
 ) -> Dict[str, Any]:
     try:
-        # Fetch question details: ID, text, and the options array (which contains the correct flag)
-        response = (
-            supabase.table("questions")
-            .select("id, question_text, options")
-            .eq("exam_id", exam_id)
-            .execute()
-        )
+        answer_key = await get_answer_key(exam_id, supabase)
 
-        if not response.data:
+        if not answer_key:
             return {"error": "Exam questions not found"}
 
-        questions_data = response.data
-        total_questions = len(questions_data)
+        total_questions = len(answer_key.question_ids)
         correct_answers_count = 0
 
         # Dictionary for quick lookup of user's submitted answers
@@ -81,32 +224,26 @@ async def calculate_exam_score(
         detailed_review = []
 
         # Calculate score and build the detailed review
-        for question in questions_data:
-            question_id = question["id"]
-            question_text = question.get("question_text", "N/A")
-            all_options = question.get("options", [])
-
+        for question in answer_key.review_questions:
+            question_id = question["question_id"]
             selected_option_id = user_answers_map.get(question_id)
-            is_correctly_answered = False
-
-            # Find the correct option using the 'is_correct' flag in the options array
-            correct_option = next(
-                (opt for opt in all_options if opt.get("is_correct") is True), None
-            )
+            correct_option_id = answer_key.correct_option_ids[question_id]
 
             # Check for correctness
-            if correct_option and correct_option["id"] == selected_option_id:
+            is_correctly_answered = (
+                correct_option_id is not None
+                and correct_option_id == selected_option_id
+            )
+            if is_correctly_answered:
                 correct_answers_count += 1
-                is_correctly_answered = True
 
-            review_entry = {
-                "question_id": question_id,
-                "question_text": question_text,
-                "options": all_options,
-                "submitted_option_id": selected_option_id,
-                "is_correctly_answered": is_correctly_answered,
-            }
-            detailed_review.append(review_entry)
+            detailed_review.append(
+                {
+                    **question,
+                    "submitted_option_id": selected_option_id,
+                    "is_correctly_answered": is_correctly_answered,
+                }
+            )
 
         # Calculate percentage
         score = (
@@ -129,243 +266,97 @@ async def calculate_exam_score(
         return {"error": f"Error calculating score: {str(e)}"}
 
 
-async def save_exam_submission(
-    user_id: int,
-    user_role: UserRole,
-    exam_id: int,
-    exam_type: str,
-    answers: List[Dict[str, Any]],
-    score: float,
-    total_questions: int,
-    correct_answers: int,
-    passing_score: float,
-    passed: bool,
-    supabase: Client,
-) -> int:
-    submission_data = {
-        "user_id": user_id,
-        "exam_id": exam_id,
-        "user_role": user_role.value,
-        "exam_type": exam_type,
-        "answers": answers,
-        "score": score,
-        "total_questions": total_questions,
-        "correct_answers": correct_answers,
-        "passing_score": passing_score,
-        "passed": passed,
-        "created_at": "now()",
-    }
-
-    response = supabase.table("submissions").insert(submission_data).execute()
-
-    return response.data[0]["id"] if response.data else 0
-
-
-async def update_progress_after_exam(
-    exam_id: int,
-    user_id: int,
-    user_role: UserRole,
-    exam_type: str,
-    current_progress: Dict[str, Any],
-    supabase: Client,
-) -> Dict[str, Any]:
-    try:
-        progress_data = current_progress.copy()
-
-        # if exam_type == "pre_exam":
-        #     # Pre-exam passed - start the course
-        #     return await update_progress_after_pre_exam(user_id, user_role, supabase)
-
-        # elif exam_type == "quiz":
-        #     # Module quiz passed - progress to next module/lesson
-        #     if user_role == UserRole.pro:
-        #         return await update_pro_progress_after_module_quiz(
-        #             user_id, progress_data, supabase
-        #         )
-        #     else:
-        #         return await update_regular_progress_after_module_quiz(
-        #             user_id, progress_data, supabase
-        #         )
-
-        # elif exam_type == "final_exam":
-        #     # Final exam passed - course completed
-        #     return await update_progress_after_final_exam(
-        #         user_id, progress_data, supabase
-        #     )
-
-        # elif exam_type == "activity":
-        #     lesson_obj = await is_last_activity_in_current_module(exam_id, supabase)
-
-        #     if lesson_obj.get("is_last"):
-        #         progress_data[
-        #             "next_available_exam_id"
-        #         ] = await get_exam_by_previous_lesson(
-        #             lesson_obj.get("lesson_id"), supabase
-        #         )
-        #     else:
-        #         next_lesson_id = await get_next_lesson_id(
-        #             lesson_obj.get("lesson_id"), supabase
-        #         )
-
-        #         progress_data["next_available_lesson_id"] = next_lesson_id
-
-        #     supabase.table("users").update({"current_progress_data": progress_data}).eq(
-        #         "id", user_id
-        #     ).execute()
-        #     return {"success": True}
-
-        # else:
-        #     return {"error": "Unknown exam type"}
-
-        next_lesson_index = get_next_lesson_index(exam_id, "exam")
-        if not next_lesson_index and exam_type != ExamType.PRE_EXAM:
-            progress_data["is_final_exam_available"] = True
-        elif exam_type == ExamType.PRE_EXAM:
-            if user_role == UserRole.pro:
-                progress_data["current_progress"] = 6
-            else:
-                progress_data["current_progress"] = 0
-        else:
-            if user_role == UserRole.regular:
-                progress_data["current_progress"] = next_lesson_index
-            else:
-                exam = get_exam_by_id(exam_id)
-                if exam and "next_exam_index" in exam:
-                    progress_data["current_progress"] = exam["next_exam_index"]
-                else:
-                    progress_data["current_progress"] = next_lesson_index
-        supabase.table("users").update({"current_progress_data": progress_data}).eq(
-            "id", user_id
-        ).execute()
-        return {"success": True}
-
-    except Exception as e:
-        return {"error": f"Error updating progress: {str(e)}"}
+REVIEW_SNAPSHOT_VERSION = 1
 
 
-async def update_progress_after_pre_exam(
-    user_id: int, user_role: UserRole, supabase: Client
-) -> Dict[str, Any]:
-    progress_data = {
-        "is_final_exam_available": False,
-        "completed_modules": [],
-        "completed_lessons": [],
-    }
-
-    if user_role == UserRole.pro:
-        progress_data.update(
-            {
-                "next_available_module_id": 1,
-                "next_available_exam_id": await get_first_exam_for_module(1, supabase),
-                "current_progress": 6,
-            }
-        )
-    else:
-        progress_data.update(
-            {
-                "next_available_lesson_id": 0,
-                "next_available_exam_id": None,
-                "current_progress": 0,
-            }
-        )
+def build_review_snapshot(detailed_review: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"version": REVIEW_SNAPSHOT_VERSION, "questions": detailed_review}
 
-    # Save to database
-    supabase.table("users").update({"current_progress_data": progress_data}).eq(
-        "id", user_id
-    ).execute()
 
-    return {"success": True}
+def read_review_snapshot(
+    snapshot: Optional[Dict[str, Any]],
+) -> Optional[List[Dict[str, Any]]]:
+    # Older submissions have no snapshot (or an outdated one) and are regraded
+    if not snapshot or snapshot.get("version") != REVIEW_SNAPSHOT_VERSION:
+        return None
+    return snapshot.get("questions")
 
 
-async def update_pro_progress_after_module_quiz(
-    user_id: int,
-    progress_data: Dict[str, Any],
-    supabase: Client,
+def get_progress_after_exam(
+    exam_id: int,
+    user_role: UserRole,
+    exam_type: str,
+    current_progress: Dict[str, Any],
+    course_id: int = DEFAULT_COURSE_ID,
 ) -> Dict[str, Any]:
-    current_module_id = progress_data.get("next_available_module_id")
-
-    if current_module_id:
-        # Move to next module
-        next_module_id = current_module_id + 1
-        progress_data["next_available_module_id"] = next_module_id
-        progress_data["completed_modules"] = progress_data.get(
-            "completed_modules", []
-        ) + [current_module_id]
-
-        # Set next available exam
-        progress_data["next_available_exam_id"] = await get_first_exam_for_module(
-            next_module_id, supabase
-        )
+    progress_data = current_progress.copy()
 
-        # Check if this was the last module
-        if await is_last_module(current_module_id, supabase):
-            progress_data["is_final_exam_available"] = True
+    if exam_type == ExamType.PRE_EXAM:
+        transitions = get_progress_transitions(user_role, course_id=course_id)
+        progress_data["current_progress"] = transitions.start if transitions else 0
+        return progress_data
 
-    # Save progress
-    supabase.table("users").update({"current_progress_data": progress_data}).eq(
-        "id", user_id
-    ).execute()
+    transitions = get_progress_transitions(user_role, exam_id=exam_id)
+    next_index = transitions.after_exam.get(exam_id) if transitions else None
+    if next_index is None:
+        progress_data["is_final_exam_available"] = True
+    else:
+        progress_data["current_progress"] = next_index
 
-    return {"success": True}
+    return progress_data
 
 
-async def update_regular_progress_after_module_quiz(
+async def submit_exam_transaction(
     user_id: int,
+    user_role: UserRole,
+    exam_id: int,
+    exam_type: str,
+    answers: List[Dict[str, Any]],
+    score_result: Dict[str, Any],
+    current_progress: Dict[str, Any],
     progress_data: Dict[str, Any],
-    supabase: Client,
-) -> Dict[str, Any]:
-    current_lesson_id = progress_data.get("next_available_lesson_id")
-
-    if current_lesson_id:
-        # Move to next lesson
-        next_lesson_id = await get_next_lesson_id(current_lesson_id, supabase)
-        progress_data["next_available_lesson_id"] = next_lesson_id
-
-        # Check if this was the last lesson
-        if not next_lesson_id:
-            progress_data["is_final_exam_available"] = True
-
-    # Save progress
-    supabase.table("users").update({"current_progress_data": progress_data}).eq(
-        "id", user_id
-    ).execute()
-
-    return {"success": True}
-
-
-async def update_progress_after_final_exam(
-    user_id: int, progress_data: Dict[str, Any], supabase: Client
+    supabase: AsyncClient,
 ) -> Dict[str, Any]:
-    progress_data["is_final_exam_available"] = False
-    progress_data["course_completed"] = True
-    progress_data["completed_at"] = datetime.now().isoformat()
-
-    # Save progress
-    supabase.table("users").update({"current_progress_data": progress_data}).eq(
-        "id", user_id
+    # Inserts the submission and patches the progress in one transaction, as
+    # long as the stored progress is still at the version of current_progress,
+    # see db/migrations/005_progress_version.sql
+    response = await supabase.rpc(
+        "submit_exam",
+        {
+            "p_user_id": user_id,
+            "p_exam_id": exam_id,
+            "p_exam_type": exam_type,
+            "p_user_role": user_role.value,
+            "p_answers": answers,
+            "p_score": score_result["score"],
+            "p_total_questions": score_result["total_questions"],
+            "p_correct_answers": score_result["correct_answers"],
+            "p_passing_score": score_result["passing_score"],
+            "p_passed": score_result["passed"],
+            "p_review": build_review_snapshot(score_result["detailed_review"]),
+            "p_expected_version": get_progress_version(current_progress),
+            "p_progress_patch": diff_progress(current_progress, progress_data),
+            "p_events": [
+                progress_event(
+                    EXAM_SUBMITTED,
+                    exam_id,
+                    "exam",
+                    {
+                        "exam_type": exam_type,
+                        "score": score_result["score"],
+                        "passed": score_result["passed"],
+                    },
+                ),
+                *progress_change_events(current_progress, progress_data),
+            ],
+        },
     ).execute()
 
-    return {"success": True}
+    result = response.data or {}
+    if result.get("progress") is not None:
+        update_cached_user_progress(user_id, result["progress"])
 
-
-async def is_exam_previously_submitted(
-    exam_id: int, user_id: int, exam_type: ExamType, supabase: Client
-):
-    exam_response = (
-        supabase.table("submissions")
-        .select("*")
-        .eq("exam_id", exam_id)
-        .eq("user_id", user_id)
-        .eq("exam_type", exam_type.value)
-        .execute()
-    )
-
-    if not exam_response.data:
-        return {}
-
-    exam_data = exam_response.data[0]
-
-    return exam_data
+    return result
 
 
 async def is_exam_allowed_by_progress(
@@ -0,0 +1,216 @@
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from supabase import AsyncClient
+
+# Progress events, see db/migrations/006_progress_events.sql
+LESSON_COMPLETED = "lesson_completed"
+EXAM_SUBMITTED = "exam_submitted"
+PROGRESS_ADVANCED = "progress_advanced"
+FINAL_EXAM_UNLOCKED = "final_exam_unlocked"
+
+# Compaction stops at the first event younger than this, so an event whose
+# transaction commits after a later id was compacted is not skipped
+PROGRESS_COMPACT_GRACE_SECONDS = 30
+PROGRESS_SNAPSHOT_USER_CHUNK_SIZE = 50
+
+EMPTY_PROGRESS_SUMMARY = {
+    "lessons_completed": 0,
+    "exams_submitted": 0,
+    "exams_passed": 0,
+    "current_progress": None,
+    "final_exam_unlocked": False,
+    "last_event_at": None,
+}
+
+
+def progress_event(
+    event_type: str,
+    item_id: Optional[int] = None,
+    item_type: Optional[str] = None,
+    data: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    return {
+        "event_type": event_type,
+        "item_id": item_id,
+        "item_type": item_type,
+        "data": data or {},
+    }
+
+
+def progress_change_events(
+    current_progress: Dict[str, Any], updated_progress: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    events = []
+
+    previous_index = current_progress.get("current_progress")
+    next_index = updated_progress.get("current_progress")
+    if next_index != previous_index:
+        events.append(
+            progress_event(
+                PROGRESS_ADVANCED, data={"from": previous_index, "to": next_index}
+            )
+        )
+
+    if updated_progress.get("is_final_exam_available") and not current_progress.get(
+        "is_final_exam_available"
+    ):
+        events.append(progress_event(FINAL_EXAM_UNLOCKED))
+
+    return events
+
+
+def fold_progress_events(
+    summary: Dict[str, Any], events: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    summary = {**EMPTY_PROGRESS_SUMMARY, **summary}
+
+    for event in events:
+        event_type = event["event_type"]
+        data = event.get("data") or {}
+
+        if event_type == LESSON_COMPLETED:
+            summary["lessons_completed"] += 1
+        elif event_type == EXAM_SUBMITTED:
+            summary["exams_submitted"] += 1
+            if data.get("passed"):
+                summary["exams_passed"] += 1
+        elif event_type == PROGRESS_ADVANCED:
+            summary["current_progress"] = data.get("to")
+        elif event_type == FINAL_EXAM_UNLOCKED:
+            summary["final_exam_unlocked"] = True
+
+        summary["last_event_at"] = event["created_at"]
+
+    return summary
+
+
+async def get_progress_events_page(
+    cursor: Optional[int],
+    limit: int,
+    supabase: AsyncClient,
+    user_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    query = supabase.table("progress_events").select("*")
+    if cursor is not None:
+        query = query.gt("id", cursor)
+    if before_id is not None:
+        query = query.lt("id", before_id)
+    if user_id is not None:
+        query = query.eq("user_id", user_id)
+    response = await query.order("id").limit(limit).execute()
+
+    events = response.data
+    next_cursor = events[-1]["id"] if len(events) == limit else None
+    return events, next_cursor
+
+
+async def get_progress_snapshots(
+    user_ids: List[int], supabase: AsyncClient
+) -> List[Dict[str, Any]]:
+    response = await (
+        supabase.table("progress_snapshots")
+        .select("user_id, last_event_id, summary")
+        .in_("user_id", user_ids)
+        .execute()
+    )
+    return response.data
+
+
+async def compact_progress_snapshots(supabase: AsyncClient) -> int:
+    started_at = time.perf_counter()
+    batch_size = settings.PROGRESS_COMPACT_BATCH_SIZE
+    cutoff = (
+        datetime.now(timezone.utc) - timedelta(seconds=PROGRESS_COMPACT_GRACE_SECONDS)
+    ).isoformat()
+
+    # Snapshots are folded forward from the newest event already compacted
+    response = await (
+        supabase.table("progress_snapshots")
+        .select("last_event_id")
+        .order("last_event_id", desc=True)
+        .limit(1)
+        .execute()
+    )
+    cursor = response.data[0]["last_event_id"] if response.data else None
+
+    # Ids are not committed in order, so only events below the first one that
+    # is still inside the grace window are safe to fold
+    query = supabase.table("progress_events").select("id").gte("created_at", cutoff)
+    if cursor is not None:
+        query = query.gt("id", cursor)
+    response = await query.order("id").limit(1).execute()
+    stop_id = response.data[0]["id"] if response.data else None
+
+    compacted = 0
+    while True:
+        events, next_cursor = await get_progress_events_page(
+            cursor, batch_size, supabase, before_id=stop_id
+        )
+        if not events:
+            break
+
+        events_by_user: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        for event in events:
+            events_by_user[event["user_id"]].append(event)
+
+        user_ids = list(events_by_user)
+        chunks = [
+            user_ids[i : i + PROGRESS_SNAPSHOT_USER_CHUNK_SIZE]
+            for i in range(0, len(user_ids), PROGRESS_SNAPSHOT_USER_CHUNK_SIZE)
+        ]
+        chunk_results = await asyncio.gather(
+            *(get_progress_snapshots(chunk, supabase) for chunk in chunks)
+        )
+        snapshots = {
+            snapshot["user_id"]: snapshot
+            for chunk_snapshots in chunk_results
+            for snapshot in chunk_snapshots
+        }
+
+        rows = []
+        for user_id, user_events in events_by_user.items():
+            snapshot = snapshots.get(user_id, {})
+            last_event_id = snapshot.get("last_event_id", 0)
+            new_events = [event for event in user_events if event["id"] > last_event_id]
+            if not new_events:
+                continue
+
+            rows.append(
+                {
+                    "user_id": user_id,
+                    "last_event_id": new_events[-1]["id"],
+                    "summary": fold_progress_events(
+                        snapshot.get("summary") or {}, new_events
+                    ),
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                }
+            )
+
+        if rows:
+            await supabase.table("progress_snapshots").upsert(rows).execute()
+        compacted += len(events)
+
+        if next_cursor is None:
+            break
+        cursor = next_cursor
+
+    print(
+        f"Compacted {compacted} progress events in "
+        f"{time.perf_counter() - started_at:.2f}s"
+    )
+    return compacted
+
+
+async def run_progress_compactor(supabase: AsyncClient) -> None:
+    while True:
+        try:
+            await compact_progress_snapshots(supabase)
+        except Exception as e:
+            print(f"Failed to compact progress snapshots: {e}")
+        await asyncio.sleep(settings.PROGRESS_COMPACT_INTERVAL_SECONDS)
@@ -0,0 +1,114 @@
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from config import settings
+from fastapi import HTTPException, status
+from supabase import AsyncClient
+from utils.cache import LRUCache
+
+# Sessions by token digest. A missing session is cached as False, so repeated
+# refreshes with a revoked or unknown token are answered from memory too.
+session_cache = LRUCache(
+    maxsize=settings.SESSION_CACHE_SIZE, ttl=settings.SESSION_CACHE_TTL_SECONDS
+)
+
+
+def hash_refresh_token(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+
+async def create_session(
+    refresh_token: str, expires_at: datetime, supabase: AsyncClient
+):
+    token_hash = hash_refresh_token(refresh_token)
+    response = await (
+        supabase.table("sessions")
+        .insert(
+            {
+                "token_hash": token_hash,
+                "expires_at": expires_at.astimezone(timezone.utc).isoformat(),
+            }
+        )
+        .execute()
+    )
+
+    session = response.data[0] if response.data else None
+    if session:
+        session_cache.set(token_hash, session)
+    return session
+
+
+async def get_session_by_refresh_token(
+    refresh_token: str, supabase: AsyncClient
+) -> Optional[Dict[str, Any]]:
+    token_hash = hash_refresh_token(refresh_token)
+
+    cached_session = session_cache.get(token_hash)
+    if cached_session is not None:
+        return cached_session or None
+
+    try:
+        response = await (
+            supabase.table("sessions")
+            .select("*")
+            .eq("token_hash", token_hash)
+            .execute()
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}",
+        )
+
+    session = response.data[0] if response.data else None
+    session_cache.set(token_hash, session or False)
+    return session
+
+
+async def delete_session(refresh_token: str, supabase: AsyncClient) -> None:
+    token_hash = hash_refresh_token(refresh_token)
+    await supabase.table("sessions").delete().eq("token_hash", token_hash).execute()
+    session_cache.set(token_hash, False)
+
+
+async def purge_expired_sessions(supabase: AsyncClient) -> int:
+    started_at = time.perf_counter()
+    now = datetime.now(timezone.utc).isoformat()
+    batch_size = settings.SESSION_PURGE_BATCH_SIZE
+    removed = 0
+
+    # Delete in bounded batches so a large backlog never becomes one huge query
+    while True:
+        response = await (
+            supabase.table("sessions")
+            .select("id")
+            .lt("expires_at", now)
+            .limit(batch_size)
+            .execute()
+        )
+        session_ids = [session["id"] for session in response.data]
+        if not session_ids:
+            break
+
+        await supabase.table("sessions").delete().in_("id", session_ids).execute()
+        removed += len(session_ids)
+
+        if len(session_ids) < batch_size:
+            break
+
+    print(
+        f"Purged {removed} expired sessions in {time.perf_counter() - started_at:.2f}s"
+    )
+    return removed
+
+
+async def run_session_sweeper(supabase: AsyncClient) -> None:
+    while True:
+        try:
+            await purge_expired_sessions(supabase)
+        except Exception as e:
+            print(f"Failed to purge expired sessions: {e}")
+        await asyncio.sleep(settings.SESSION_PURGE_INTERVAL_SECONDS)
@@ -0,0 +1,109 @@
+import asyncio
+
+from services import course_graph
+from services.course_graph import _extends_layout
+from utils.course_content import CourseGraph, CourseGraphRegistry, course_content
+
+APPENDED_MODULE = [
+    {"id": 31, "type": "lesson", "name": "الأهداف"},
+    {"id": 32, "type": "exam", "name": "اختبار الوحدة الخامسة", "is_quiz": True},
+]
+
+
+def with_quiz_link(content, index, next_exam_index):
+    content = [dict(item) for item in content]
+    content[index]["next_exam_index"] = next_exam_index
+    return content
+
+
+def test_same_layout_is_accepted():
+    current = CourseGraph.build(course_content)
+    assert _extends_layout(current, CourseGraph.build(course_content))
+
+
+def test_appended_module_is_accepted():
+    current = CourseGraph.build(course_content)
+    content = with_quiz_link(course_content, 25, len(course_content) + 1)
+    assert _extends_layout(current, CourseGraph.build(content + APPENDED_MODULE))
+
+
+def test_reordered_items_are_rejected():
+    current = CourseGraph.build(course_content)
+    content = [course_content[1], course_content[0], *course_content[2:]]
+    assert not _extends_layout(current, CourseGraph.build(content))
+
+
+def test_removed_items_are_rejected():
+    current = CourseGraph.build(course_content)
+    content = [item for index, item in enumerate(course_content) if index != 8]
+    content = [
+        {**item, "next_exam_index": item["next_exam_index"] - 1}
+        if item.get("next_exam_index")
+        else item
+        for item in content
+    ]
+    assert not _extends_layout(current, CourseGraph.build(content))
+
+
+def test_relinked_quiz_is_rejected():
+    current = CourseGraph.build(course_content)
+    content = with_quiz_link(course_content, 6, 19)
+    assert not _extends_layout(current, CourseGraph.build(content))
+
+
+class FakeQuery:
+    def __init__(self, data):
+        self.data = data
+
+    def select(self, *args):
+        return self
+
+    def eq(self, *args):
+        return self
+
+    async def execute(self):
+        return self
+
+
+class FakeSupabase:
+    def __init__(self, courses):
+        self.courses = courses
+
+    def table(self, name):
+        return FakeQuery(self.courses)
+
+
+def course_row(course_id, lesson_ids):
+    return {
+        "id": course_id,
+        "modules": [
+            {
+                "id": 1,
+                "created_at": "0",
+                "lessons": [
+                    {"id": lesson_id, "name": "lesson", "created_at": str(index)}
+                    for index, lesson_id in enumerate(lesson_ids)
+                ],
+                "exams": [{"id": 1, "name": "quiz", "created_at": "0"}],
+            }
+        ],
+    }
+
+
+def test_every_loaded_course_keeps_its_layout(monkeypatch):
+    registry = CourseGraphRegistry({})
+    monkeypatch.setattr(course_graph, "course_graphs", registry)
+    indexed = []
+    monkeypatch.setattr(course_graph, "publish_course_index", indexed.append)
+
+    def load(lesson_ids):
+        supabase = FakeSupabase([course_row(2, lesson_ids)])
+        asyncio.run(course_graph.load_course_graphs(supabase))
+        return [item["id"] for item in registry.get(2).items]
+
+    assert load([101, 102]) == [101, 102, 1]
+    assert load([102, 101]) == [101, 102, 1]
+    assert load([101]) == [101, 102, 1]
+
+    # Only the accepted layout was indexed
+    assert [list(courses) for courses in indexed] == [[2], [], []]
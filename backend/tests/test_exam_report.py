@@ -0,0 +1,53 @@
+from utils.exam_report import NO_OPTION, build_correctness_matrix
+
+QUESTIONS = [
+    {
+        "question_id": 1,
+        "options": [{"id": 10, "option_text": "a"}, {"id": 11, "option_text": "b"}],
+    },
+    {
+        "question_id": 2,
+        "options": [{"id": 20, "option_text": "c"}, {"id": 21, "option_text": "d"}],
+    },
+]
+CORRECT_OPTION_IDS = {1: 10, 2: 20}
+
+
+def answers(first, second):
+    return [
+        {"question_id": 1, "selected_option_id": first},
+        {"question_id": 2, "selected_option_id": second},
+    ]
+
+
+def test_marks_correct_and_wrong_answers():
+    matrix = build_correctness_matrix(
+        QUESTIONS, CORRECT_OPTION_IDS, [answers(10, 21), answers(11, 20)]
+    )
+
+    assert matrix.correct.tolist() == [[True, False], [False, True]]
+    assert matrix.percent_correct().tolist() == [50, 50]
+    assert matrix.most_chosen_wrong_options() == [11, 21]
+
+
+def test_unanswered_questions_are_wrong():
+    matrix = build_correctness_matrix(
+        QUESTIONS, CORRECT_OPTION_IDS, [answers(None, 20), [{"question_id": 1}]]
+    )
+
+    assert matrix.correct.tolist() == [[False, True], [False, False]]
+    assert matrix.selected[1].tolist() == [NO_OPTION, NO_OPTION]
+
+
+def test_non_integer_answers_are_wrong():
+    students = [
+        answers("10", 10.5),
+        answers(True, 20.0),
+        answers("not an option", [20]),
+        answers(11, 21),
+    ]
+    matrix = build_correctness_matrix(QUESTIONS, CORRECT_OPTION_IDS, students)
+
+    assert not matrix.correct[:3].any()
+    assert matrix.answered.all()
+    assert matrix.most_chosen_wrong_options() == [11, 21]
@@ -0,0 +1,64 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from utils.http_cache import PrecompressedPayload, payload_response
+
+payload = PrecompressedPayload.build({"name": "الدرس الأول", "items": list(range(50))})
+
+app = FastAPI()
+
+
+@app.get("/payload")
+async def get_payload(request: Request):
+    return payload_response(request, payload)
+
+
+client = TestClient(app)
+
+
+def get(accept_encoding, if_none_match=None):
+    headers = {"Accept-Encoding": accept_encoding}
+    if if_none_match:
+        headers["If-None-Match"] = if_none_match
+    return client.get("/payload", headers=headers)
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, content_encoding",
+    [
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("gzip, br", "br"),
+        ("br;q=0, gzip", "gzip"),
+    ],
+)
+def test_serves_the_accepted_encoding(accept_encoding, content_encoding):
+    response = get(accept_encoding)
+
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") == content_encoding
+    assert response.json()["name"] == "الدرس الأول"
+
+
+def test_etag_differs_per_encoding():
+    etags = {get(encoding).headers["etag"] for encoding in ("identity", "gzip", "br")}
+
+    assert etags == {
+        payload.etag,
+        payload.etag[:-1] + '-gzip"',
+        payload.etag[:-1] + '-br"',
+    }
+
+
+def test_any_encoding_etag_revalidates():
+    gzip_etag = get("gzip").headers["etag"]
+    response = get("br", if_none_match=f"W/{gzip_etag}")
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == payload.etag[:-1] + '-br"'
+
+
+def test_changed_content_is_sent_again():
+    response = get("gzip", if_none_match='"stale"')
+
+    assert response.status_code == 200
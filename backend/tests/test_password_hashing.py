@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+from config import settings
+from fastapi import HTTPException
+from utils import auth
+
+
+@pytest.fixture
+def full_queue(monkeypatch):
+    monkeypatch.setattr(auth, "get_password_hash", lambda password: f"hash:{password}")
+    monkeypatch.setattr(auth, "PASSWORD_HASH_WAIT_SECONDS", 0.01)
+    monkeypatch.setattr(
+        auth.password_hash_metrics, "pending", settings.PASSWORD_HASH_MAX_PENDING
+    )
+    return auth.password_hash_metrics
+
+
+def test_single_hash_is_rejected_when_the_queue_is_full(full_queue):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(auth.get_password_hash_async("secret"))
+    assert error.value.status_code == 503
+
+
+def test_bulk_hashes_wait_for_capacity(full_queue):
+    async def run():
+        hashes = asyncio.create_task(auth.get_password_hashes_async(["a", "b", "c"]))
+        await asyncio.sleep(0.05)
+        assert not hashes.done()
+
+        full_queue.pending = 0
+        return await hashes
+
+    assert asyncio.run(run()) == ["hash:a", "hash:b", "hash:c"]
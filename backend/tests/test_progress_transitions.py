@@ -0,0 +1,130 @@
+import random
+
+import pytest
+from schemas.auth import UserRole
+from schemas.exam import ExamType
+from services.course_graph import build_course_content
+from services.exam import get_progress_after_exam
+from utils.course_content import (
+    CourseGraph,
+    build_progress_transitions,
+    course_content,
+    get_next_exam_index,
+    get_next_lesson_index,
+)
+
+EXAM_IDS = sorted({item["id"] for item in course_content if item["type"] == "exam"})
+PROGRESS_STATES = [
+    {"current_progress": None, "is_final_exam_available": False},
+    {"current_progress": 0, "is_final_exam_available": False},
+    {"current_progress": 12, "is_final_exam_available": True},
+]
+
+
+def legacy_progress_after_exam(exam_id, user_role, exam_type, current_progress):
+    """The scan based logic the transition tables replaced."""
+    progress_data = current_progress.copy()
+    next_lesson_index = get_next_lesson_index(exam_id, "exam")
+
+    if not next_lesson_index and exam_type != ExamType.PRE_EXAM:
+        progress_data["is_final_exam_available"] = True
+    elif exam_type == ExamType.PRE_EXAM:
+        progress_data["current_progress"] = 6 if user_role == UserRole.pro else 0
+    elif user_role == UserRole.regular:
+        progress_data["current_progress"] = next_lesson_index
+    else:
+        next_exam_index = get_next_exam_index(exam_id)
+        progress_data["current_progress"] = (
+            next_exam_index if next_exam_index is not None else next_lesson_index
+        )
+
+    return progress_data
+
+
+@pytest.mark.parametrize("current_progress", PROGRESS_STATES)
+@pytest.mark.parametrize("exam_type", list(ExamType))
+@pytest.mark.parametrize("user_role", list(UserRole))
+@pytest.mark.parametrize("exam_id", EXAM_IDS)
+def test_matches_legacy_logic(exam_id, user_role, exam_type, current_progress):
+    assert get_progress_after_exam(
+        exam_id, user_role, exam_type, current_progress
+    ) == legacy_progress_after_exam(exam_id, user_role, exam_type, current_progress)
+
+
+def test_does_not_mutate_current_progress():
+    current_progress = {"current_progress": 3, "is_final_exam_available": False}
+    get_progress_after_exam(17, UserRole.pro, ExamType.QUIZ, current_progress)
+    assert current_progress == {"current_progress": 3, "is_final_exam_available": False}
+
+
+def test_single_quiz_course_starts_pro_at_the_quiz():
+    graph = CourseGraph.build(
+        [
+            {"id": 1, "type": "lesson", "name": "lesson"},
+            {"id": 2, "type": "exam", "name": "activity"},
+            {"id": 3, "type": "lesson", "name": "lesson"},
+            {"id": 4, "type": "exam", "name": "quiz", "is_quiz": True},
+        ]
+    )
+
+    assert graph.transitions_for(UserRole.pro).start == 3
+    assert graph.transitions_for(UserRole.regular).start == 0
+    assert graph.transitions_for(UserRole.pro).after_exam[4] is None
+
+
+def random_course(rng, course_id):
+    ids = iter(range(1, 1000))
+    timestamp = iter(range(1000))
+
+    def row(**fields):
+        return {"id": next(ids), "created_at": f"{next(timestamp):04d}", **fields}
+
+    modules = []
+    for _ in range(rng.randint(1, 5)):
+        lessons, exams = [], []
+        for _ in range(rng.randint(0, 4)):
+            lesson = row(name="lesson", activity_id=None, activity=None)
+            if rng.random() < 0.4:
+                activity = row(name="activity")
+                lesson["activity_id"] = activity["id"]
+                lesson["activity"] = {"id": activity["id"], "name": "activity"}
+                exams.append(activity)
+            lessons.append(lesson)
+        exams.extend(row(name="quiz") for _ in range(rng.randint(0, 2)))
+        rng.shuffle(lessons)
+        rng.shuffle(exams)
+        modules.append(row(lessons=lessons, exams=exams))
+
+    rng.shuffle(modules)
+    return {"id": course_id, "modules": modules}
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_generated_courses(seed):
+    rng = random.Random(seed)
+    content = build_course_content(random_course(rng, seed))
+    if not content:
+        return
+
+    graph = CourseGraph.build(content)
+    quiz_indexes = [index for index, item in enumerate(content) if item.get("is_quiz")]
+
+    for role in UserRole:
+        transitions = build_progress_transitions(graph.items, role)
+        expected_start = quiz_indexes[0] if role == UserRole.pro and quiz_indexes else 0
+        assert transitions.start == expected_start
+
+        for index, item in enumerate(content):
+            if item["type"] != "exam":
+                continue
+
+            next_index = transitions.after_exam[item["id"]]
+            if index == len(content) - 1:
+                assert next_index is None
+                continue
+
+            assert next_index is not None and index < next_index < len(content)
+            if role == UserRole.regular or index not in quiz_indexes[:-1]:
+                assert next_index == index + 1
+            else:
+                assert next_index == quiz_indexes[quiz_indexes.index(index) + 1]
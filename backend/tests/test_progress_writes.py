@@ -0,0 +1,63 @@
+import asyncio
+
+from fastapi import BackgroundTasks
+from services import course
+
+
+def test_dropped_flush_is_rescheduled(monkeypatch):
+    saved = []
+
+    async def save_progress_after_lesson(user_id, lesson_id, progress_data, supabase):
+        saved.append((user_id, lesson_id))
+
+    monkeypatch.setattr(
+        course, "save_progress_after_lesson", save_progress_after_lesson
+    )
+    monkeypatch.setattr(
+        course, "get_progress_after_lesson", lambda lesson_id, progress: progress
+    )
+    monkeypatch.setattr(course, "update_cached_user_progress", lambda *args: None)
+
+    # The first response failed, so its background flush never ran
+    dropped = BackgroundTasks()
+    assert course.update_progress_after_lesson_completion(7, 1, {}, None, dropped)
+
+    background_tasks = BackgroundTasks()
+    assert course.update_progress_after_lesson_completion(
+        7, 2, {}, None, background_tasks
+    )
+    assert len(background_tasks.tasks) == 1
+
+    asyncio.run(background_tasks())
+    assert saved == [(7, 2)]
+    assert 7 not in course.pending_progress_writes
+    assert 7 not in course.progress_writers
+
+
+def test_one_write_in_flight_per_user(monkeypatch):
+    saved = []
+    release = asyncio.Event()
+
+    async def save_progress_after_lesson(user_id, lesson_id, progress_data, supabase):
+        saved.append(lesson_id)
+        await release.wait()
+
+    monkeypatch.setattr(
+        course, "save_progress_after_lesson", save_progress_after_lesson
+    )
+
+    async def run():
+        course.pending_progress_writes[8] = (1, {})
+        first = asyncio.create_task(course.flush_progress_write(8, None))
+        await asyncio.sleep(0)
+
+        course.pending_progress_writes[8] = (2, {})
+        course.pending_progress_writes[8] = (3, {})
+        await course.flush_progress_write(8, None)
+
+        release.set()
+        await first
+
+    asyncio.run(run())
+    assert saved == [1, 3]
+    assert 8 not in course.pending_progress_writes
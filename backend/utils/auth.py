@@ -1,5 +1,10 @@
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional
 
 import jwt
 from fastapi import HTTPException, status
@@ -12,6 +17,7 @@ from schemas.auth import (
     TokenType,
     UserRole,
 )
+from utils.cache import LRUCache
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -43,7 +49,16 @@ def create_token(
     return encoded_jwt
 
 
+# Verified access tokens keyed by their digest, kept until the token expires
+token_cache = LRUCache(maxsize=settings.TOKEN_CACHE_SIZE)
+
+
 def decode_token(token: str):
+    token_key = hashlib.sha256(token.encode()).digest()
+    cached_token_data = token_cache.get(token_key)
+    if cached_token_data is not None and cached_token_data.exp > time.time():
+        return cached_token_data
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -76,6 +91,7 @@ def decode_token(token: str):
         created_at=created_at,
         exp=expires_at,
     )
+    token_cache.set(token_key, token_data, ttl=expires_at - time.time())
     return token_data
 
 
@@ -87,6 +103,115 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class PasswordHashMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_hash_seconds = 0.0
+        self.max_hash_seconds = 0.0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, wait_seconds: float, hash_seconds: float) -> None:
+        with self._lock:
+            self.completed += 1
+            self.total_hash_seconds += hash_seconds
+            self.max_hash_seconds = max(self.max_hash_seconds, hash_seconds)
+            self.total_wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                "workers": settings.PASSWORD_HASH_WORKERS,
+                "max_pending": settings.PASSWORD_HASH_MAX_PENDING,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_hash_ms": self.total_hash_seconds / completed * 1000,
+                "max_hash_ms": self.max_hash_seconds * 1000,
+                "avg_wait_ms": self.total_wait_seconds / completed * 1000,
+                "max_wait_ms": self.max_wait_seconds * 1000,
+            }
+
+
+# bcrypt releases the GIL while hashing, so a thread pool hashes in parallel
+# without blocking the event loop
+password_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+password_hash_metrics = PasswordHashMetrics()
+
+
+# How often a bulk caller that waits for capacity checks the queue again
+PASSWORD_HASH_WAIT_SECONDS = 0.05
+
+
+async def run_password_task(
+    func: Callable[..., Any], *args: Any, wait: bool = False
+) -> Any:
+    # Requests are rejected when the queue is full, bulk work waits instead
+    metrics = password_hash_metrics
+    while metrics.pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        if wait:
+            await asyncio.sleep(PASSWORD_HASH_WAIT_SECONDS)
+            continue
+        metrics.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+
+    submitted_at = time.perf_counter()
+
+    def task():
+        started_at = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            metrics.record(
+                wait_seconds=started_at - submitted_at,
+                hash_seconds=time.perf_counter() - started_at,
+            )
+
+    metrics.pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_hash_executor, task)
+    finally:
+        metrics.pending -= 1
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await run_password_task(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await run_password_task(get_password_hash, password)
+
+
+async def get_password_hashes_async(passwords: List[str]) -> List[str]:
+    # Hash in rounds of one password per worker, so a large batch runs in
+    # parallel without flooding the queue that logins also wait in. A full
+    # queue delays the batch instead of failing it.
+    hashes: List[str] = []
+    batch_size = settings.PASSWORD_HASH_WORKERS
+    for i in range(0, len(passwords), batch_size):
+        hashes.extend(
+            await asyncio.gather(
+                *(
+                    run_password_task(get_password_hash, password, wait=True)
+                    for password in passwords[i : i + batch_size]
+                )
+            )
+        )
+    return hashes
+
+
 def create_user_progress(user_role: UserRole) -> dict:
     base_progress = {
         "role": user_role.value,
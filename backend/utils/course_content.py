@@ -1,3 +1,9 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from schemas.auth import UserRole
+
 course_content = [
     {"id": 1, "type": "lesson", "name": "الأهداف"},
     {"id": 2, "type": "lesson", "name": "الدرس الأول"},
@@ -5,47 +11,258 @@ course_content = [
     {"id": 3, "type": "lesson", "name": "الدرس الثانى"},
     {"id": 5, "type": "lesson", "name": "نشاط"},
     {"id": 4, "type": "lesson", "name": "الدرس الثالث"},
-    {"id": 17, "type": "exam", "name": "اختبار الوحدة الأولى", "next_exam_index": 13},
+    {
+        "id": 17,
+        "type": "exam",
+        "name": "اختبار الوحدة الأولى",
+        "next_exam_index": 13,
+        "is_quiz": True,
+    },
     {"id": 11, "type": "lesson", "name": "الأهداف"},
     {"id": 12, "type": "lesson", "name": "الدرس الأول"},
     {"id": 15, "type": "lesson", "name": "نشاط"},
     {"id": 13, "type": "lesson", "name": "الدرس الثانى"},
     {"id": 20, "type": "exam", "name": "اختبر نفسك"},
     {"id": 14, "type": "lesson", "name": "الدرس الثالث"},
-    {"id": 22, "type": "exam", "name": "اختبار الوحدة الثانية", "next_exam_index": 19},
+    {
+        "id": 22,
+        "type": "exam",
+        "name": "اختبار الوحدة الثانية",
+        "next_exam_index": 19,
+        "is_quiz": True,
+    },
     {"id": 17, "type": "lesson", "name": "الأهداف"},
     {"id": 18, "type": "lesson", "name": "الدرس الأول"},
     {"id": 19, "type": "lesson", "name": "نشاط"},
     {"id": 20, "type": "lesson", "name": "الدرس الثانى"},
     {"id": 23, "type": "exam", "name": "اختبر نفسك"},
-    {"id": 24, "type": "exam", "name": "اختبار الوحدة الثالثة", "next_exam_index": 25},
+    {
+        "id": 24,
+        "type": "exam",
+        "name": "اختبار الوحدة الثالثة",
+        "next_exam_index": 25,
+        "is_quiz": True,
+    },
     {"id": 21, "type": "lesson", "name": "الأهداف"},
     {"id": 22, "type": "lesson", "name": "الدرس الأول"},
     {"id": 23, "type": "lesson", "name": "نشاط"},
     {"id": 24, "type": "lesson", "name": "الدرس الثانى"},
     {"id": 25, "type": "lesson", "name": "نشاط"},
-    {"id": 25, "type": "exam", "name": "اختبار الوحدة الرابعة"},
+    {"id": 25, "type": "exam", "name": "اختبار الوحدة الرابعة", "is_quiz": True},
 ]
 
 
+ItemKey = Tuple[int, str]
+
+
+@dataclass(frozen=True)
+class ProgressTransitions:
+    """Where ``current_progress`` moves for one course and role.
+
+    ``after_exam`` maps an exam id to the index unlocked by submitting it, or
+    to None when the exam closes the course and unlocks the final exam.
+    """
+
+    start: int
+    after_exam: Mapping[int, Optional[int]]
+
+
+def build_progress_transitions(
+    items: Tuple[Mapping[str, Any], ...], role: UserRole
+) -> ProgressTransitions:
+    quiz_indexes = [index for index, item in enumerate(items) if item.get("is_quiz")]
+
+    after_exam: Dict[int, Optional[int]] = {}
+    for index, item in enumerate(items):
+        if item["type"] != "exam":
+            continue
+
+        next_index = index + 1 if index + 1 < len(items) else None
+        # Only regular students go through every item, the other roles jump
+        # from one module quiz to the next
+        if role != UserRole.regular and next_index is not None:
+            next_exam_index = item.get("next_exam_index")
+            if next_exam_index is not None:
+                next_index = next_exam_index
+        after_exam[item["id"]] = next_index
+
+    # Pro students start at the first module quiz, everyone else at the start
+    start = quiz_indexes[0] if role == UserRole.pro and quiz_indexes else 0
+
+    return ProgressTransitions(start=start, after_exam=MappingProxyType(after_exam))
+
+
+@dataclass(frozen=True)
+class CourseGraph:
+    """Read-only view of an ordered course content list.
+
+    Items are indexed by their ``(id, type)`` pair once, so every lookup is a
+    dictionary hit instead of a scan over the content list.
+    """
+
+    items: Tuple[Mapping[str, Any], ...]
+    index_by_key: Mapping[ItemKey, int]
+    transitions: Mapping[UserRole, ProgressTransitions]
+
+    @classmethod
+    def build(cls, content: List[Dict[str, Any]]) -> "CourseGraph":
+        items = tuple(MappingProxyType(dict(item)) for item in content)
+
+        index_by_key: Dict[ItemKey, int] = {}
+        duplicates = []
+        for index, item in enumerate(items):
+            key = (item["id"], item["type"])
+            if key in index_by_key:
+                duplicates.append(key)
+                continue
+            index_by_key[key] = index
+
+        if duplicates:
+            raise ValueError(f"Duplicate course content items: {duplicates}")
+
+        for index, item in enumerate(items):
+            next_exam_index = item.get("next_exam_index")
+            if next_exam_index is None:
+                continue
+            if not 0 <= next_exam_index < len(items):
+                raise ValueError(
+                    f"Item {index} points to missing next exam {next_exam_index}"
+                )
+            if items[next_exam_index]["type"] != "exam":
+                raise ValueError(
+                    f"Item {index} next_exam_index {next_exam_index} is not an exam"
+                )
+
+        transitions = {
+            role: build_progress_transitions(items, role) for role in UserRole
+        }
+
+        return cls(
+            items=items,
+            index_by_key=MappingProxyType(index_by_key),
+            transitions=MappingProxyType(transitions),
+        )
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def index_of(self, id: int, type: str) -> Optional[int]:
+        return self.index_by_key.get((id, type))
+
+    def get(self, id: int, type: str) -> Optional[Mapping[str, Any]]:
+        index = self.index_of(id, type)
+        return self.items[index] if index is not None else None
+
+    def next_index(self, id: int, type: str) -> Optional[int]:
+        index = self.index_of(id, type)
+        if index is None or index + 1 >= len(self.items):
+            return None
+        return index + 1
+
+    def previous_index(self, id: int, type: str) -> Optional[int]:
+        index = self.index_of(id, type)
+        if index is None or index == 0:
+            return None
+        return index - 1
+
+    def next_exam_index(self, id: int) -> Optional[int]:
+        exam = self.get(id, "exam")
+        return exam.get("next_exam_index") if exam else None
+
+    def transitions_for(self, role: UserRole) -> ProgressTransitions:
+        return self.transitions[role]
+
+
+@dataclass(frozen=True)
+class CourseGraphSnapshot:
+    version: int
+    graphs: Mapping[int, CourseGraph]
+    course_by_item: Mapping[ItemKey, int]
+
+
+class CourseGraphRegistry:
+    """Holds the course graphs of every course as one versioned snapshot.
+
+    Publishing builds a whole new snapshot and swaps it in with a single
+    assignment, so readers always see a consistent set of graphs.
+    """
+
+    def __init__(self, graphs: Dict[int, CourseGraph]):
+        self._snapshot = self._build_snapshot(1, graphs)
+
+    @staticmethod
+    def _build_snapshot(
+        version: int, graphs: Dict[int, CourseGraph]
+    ) -> CourseGraphSnapshot:
+        course_by_item: Dict[ItemKey, int] = {}
+        for course_id, graph in graphs.items():
+            for key in graph.index_by_key:
+                course_by_item[key] = course_id
+
+        return CourseGraphSnapshot(
+            version=version,
+            graphs=MappingProxyType(dict(graphs)),
+            course_by_item=MappingProxyType(course_by_item),
+        )
+
+    @property
+    def snapshot(self) -> CourseGraphSnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def get(self, course_id: int) -> Optional[CourseGraph]:
+        return self._snapshot.graphs.get(course_id)
+
+    def for_item(self, id: int, type: str) -> Optional[CourseGraph]:
+        snapshot = self._snapshot
+        course_id = snapshot.course_by_item.get((id, type))
+        if course_id is None:
+            return None
+        return snapshot.graphs[course_id]
+
+    def publish(self, graphs: Dict[int, CourseGraph]) -> int:
+        snapshot = self._snapshot
+        merged = {**snapshot.graphs, **graphs}
+        self._snapshot = self._build_snapshot(snapshot.version + 1, merged)
+        return self._snapshot.version
+
+
+DEFAULT_COURSE_ID = 1
+
+course_graphs = CourseGraphRegistry(
+    {DEFAULT_COURSE_ID: CourseGraph.build(course_content)}
+)
+
+
 def get_next_lesson_index(id, type):
-    for i in range(len(course_content)):
-        if course_content[i]["id"] == id and course_content[i]["type"] == type:
-            if i + 1 < len(course_content):
-                return i + 1
-            else:
-                return None
+    graph = course_graphs.for_item(id, type)
+    return graph.next_index(id, type) if graph else None
 
 
 def get_lesson_index(id, type):
-    for i in range(len(course_content)):
-        if course_content[i]["id"] == id and course_content[i]["type"] == type:
-            return i
-    return None
+    graph = course_graphs.for_item(id, type)
+    return graph.index_of(id, type) if graph else None
 
 
 def get_exam_by_id(id):
-    for item in course_content:
-        if item["id"] == id and item["type"] == "exam":
-            return item
-    return None
+    graph = course_graphs.for_item(id, "exam")
+    return graph.get(id, "exam") if graph else None
+
+
+def get_next_exam_index(id):
+    graph = course_graphs.for_item(id, "exam")
+    return graph.next_exam_index(id) if graph else None
+
+
+def get_progress_transitions(
+    role: UserRole, exam_id: Optional[int] = None, course_id: int = DEFAULT_COURSE_ID
+) -> Optional[ProgressTransitions]:
+    """Transitions of the course holding ``exam_id``, else of ``course_id``."""
+    if exam_id is not None:
+        graph = course_graphs.for_item(exam_id, "exam")
+    else:
+        graph = course_graphs.get(course_id)
+    return graph.transitions_for(role) if graph else None
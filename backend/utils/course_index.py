@@ -0,0 +1,93 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+
+def ordered_rows(rows: List[Dict[str, Any]] | None) -> List[Dict[str, Any]]:
+    return sorted(rows or [], key=lambda row: (row["created_at"], row["id"]))
+
+
+@dataclass(frozen=True)
+class CourseIndex:
+    """Module -> ordered lessons and exams hierarchy of every loaded course.
+
+    Lessons and exams are kept in creation order, the same order the course
+    graphs use, so module lookups are dictionary hits instead of queries. Only
+    courses whose graph was published are indexed, see load_course_graphs.
+    """
+
+    modules_by_course: Mapping[int, Tuple[Mapping[str, Any], ...]]
+    module_ids: Tuple[int, ...]
+    lessons_by_module: Mapping[int, Tuple[int, ...]]
+    exams_by_module: Mapping[int, Tuple[int, ...]]
+    module_by_lesson: Mapping[int, int]
+    lesson_by_activity: Mapping[int, int]
+    first_lesson_id: Optional[int]
+
+    @classmethod
+    def build(
+        cls, modules_by_course: Mapping[int, List[Dict[str, Any]]]
+    ) -> "CourseIndex":
+        lessons_by_module: Dict[int, Tuple[int, ...]] = {}
+        exams_by_module: Dict[int, Tuple[int, ...]] = {}
+        module_by_lesson: Dict[int, int] = {}
+        lesson_by_activity: Dict[int, int] = {}
+        all_lessons = []
+
+        for modules in modules_by_course.values():
+            for module in modules:
+                lessons = ordered_rows(module.get("lessons"))
+                all_lessons.extend(lessons)
+
+                lessons_by_module[module["id"]] = tuple(
+                    lesson["id"] for lesson in lessons
+                )
+                exams_by_module[module["id"]] = tuple(
+                    exam["id"] for exam in ordered_rows(module.get("exams"))
+                )
+
+                for lesson in lessons:
+                    module_by_lesson[lesson["id"]] = module["id"]
+                    if lesson.get("activity_id"):
+                        lesson_by_activity[lesson["activity_id"]] = lesson["id"]
+
+        first_lessons = ordered_rows(all_lessons)[:1]
+
+        return cls(
+            modules_by_course=MappingProxyType(
+                {
+                    course_id: tuple(MappingProxyType(module) for module in modules)
+                    for course_id, modules in modules_by_course.items()
+                }
+            ),
+            module_ids=tuple(sorted(lessons_by_module)),
+            lessons_by_module=MappingProxyType(lessons_by_module),
+            exams_by_module=MappingProxyType(exams_by_module),
+            module_by_lesson=MappingProxyType(module_by_lesson),
+            lesson_by_activity=MappingProxyType(lesson_by_activity),
+            first_lesson_id=first_lessons[0]["id"] if first_lessons else None,
+        )
+
+    def is_last_lesson_of_module(self, lesson_id: int) -> bool:
+        module_id = self.module_by_lesson.get(lesson_id)
+        if module_id is None:
+            return False
+        return self.lessons_by_module[module_id][-1] == lesson_id
+
+
+_course_index = CourseIndex.build({})
+
+
+def get_course_index() -> CourseIndex:
+    return _course_index
+
+
+def publish_course_index(
+    modules_by_course: Mapping[int, List[Dict[str, Any]]],
+) -> CourseIndex:
+    """Rebuild the index with the given courses replaced and swap it in."""
+    global _course_index
+    _course_index = CourseIndex.build(
+        {**_course_index.modules_by_course, **modules_by_course}
+    )
+    return _course_index
@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Mapping, Optional
+
+import numpy as np
+
+# Marks an unanswered question (or a question without a correct option)
+NO_OPTION = -1
+# Marks an answer that is not an option id, it never matches the answer key
+INVALID_OPTION = -2
+
+
+@dataclass(frozen=True)
+class CorrectnessMatrix:
+    """Students x questions view of every submission of one exam."""
+
+    question_ids: List[int]
+    option_texts: List[Dict[int, str]]
+    selected: np.ndarray
+    correct: np.ndarray
+
+    @property
+    def answered(self) -> np.ndarray:
+        return self.selected != NO_OPTION
+
+    def percent_correct(self) -> np.ndarray:
+        if not len(self.correct):
+            return np.zeros(len(self.question_ids))
+        return self.correct.mean(axis=0) * 100
+
+    def most_chosen_wrong_options(self) -> List[Optional[int]]:
+        wrong = self.answered & ~self.correct
+        most_chosen = []
+        for column in range(len(self.question_ids)):
+            choices = self.selected[wrong[:, column], column]
+            choices = choices[choices != INVALID_OPTION]
+            if not choices.size:
+                most_chosen.append(None)
+                continue
+            option_ids, counts = np.unique(choices, return_counts=True)
+            most_chosen.append(int(option_ids[counts.argmax()]))
+        return most_chosen
+
+
+def build_correctness_matrix(
+    questions: List[Dict[str, Any]],
+    correct_option_ids: Mapping[int, Optional[int]],
+    answers_by_student: List[List[Dict[str, Any]]],
+) -> CorrectnessMatrix:
+    question_ids = [question["question_id"] for question in questions]
+    column_by_question = {
+        question_id: column for column, question_id in enumerate(question_ids)
+    }
+
+    answer_key = np.array(
+        [
+            NO_OPTION
+            if correct_option_ids.get(question_id) is None
+            else correct_option_ids[question_id]
+            for question_id in question_ids
+        ],
+        dtype=np.int64,
+    )
+
+    # Single pass over all answers to fill the selected option of each cell
+    selected = np.full((len(answers_by_student), len(question_ids)), NO_OPTION)
+    for row, answers in enumerate(answers_by_student):
+        for answer in answers:
+            column = column_by_question.get(answer.get("question_id"))
+            option_id = answer.get("selected_option_id")
+            if column is None or option_id is None:
+                continue
+            if isinstance(option_id, int) and not isinstance(option_id, bool):
+                selected[row, column] = option_id
+            else:
+                selected[row, column] = INVALID_OPTION
+
+    correct = (selected == answer_key) & (answer_key != NO_OPTION)
+
+    option_texts = [
+        {
+            option["id"]: option.get("option_text", "")
+            for option in question.get("options", [])
+        }
+        for question in questions
+    ]
+
+    return CorrectnessMatrix(
+        question_ids=question_ids,
+        option_texts=option_texts,
+        selected=selected,
+        correct=correct,
+    )
+
+
+def generate_report_rows(
+    matrix: CorrectnessMatrix,
+    students: List[Dict[str, Any]],
+    trailing_columns: int,
+) -> Iterator[List[Any]]:
+    number_of_questions = len(matrix.question_ids)
+    marks = np.where(matrix.correct, "1", "0")
+
+    for row, student in enumerate(students):
+        submission = student["submission"]
+        score = int(submission["score"])
+        passing_score = int(submission["passing_score"])
+
+        yield [
+            student["name"],
+            *marks[row].tolist(),
+            submission["correct_answers"],
+            number_of_questions,
+            score,
+            passing_score,
+            "ناجح" if score >= passing_score else "راسب",
+        ]
+
+    padding = [""] * trailing_columns
+
+    yield [
+        "نسبة الإجابات الصحيحة",
+        *[f"{percent:.0f}%" for percent in matrix.percent_correct()],
+        *padding,
+    ]
+
+    wrong_options = matrix.most_chosen_wrong_options()
+    yield [
+        "الاختيار الخاطئ الأكثر شيوعا",
+        *[
+            texts.get(option_id, "") if option_id is not None else ""
+            for texts, option_id in zip(matrix.option_texts, wrong_options)
+        ],
+        *padding,
+    ]
@@ -4,3 +4,19 @@ def generate_question_headers(questions):
         headers.append(f"السؤال {question_index + 1}")
 
     return headers
+
+
+# Asset types browsers can preload, anything else is only prefetched
+PRELOAD_DESTINATIONS = {"image": "image", "video": "video"}
+
+
+def generate_preload_link_header(assets):
+    links = []
+    for asset in assets:
+        destination = PRELOAD_DESTINATIONS.get(asset["type"])
+        if destination:
+            links.append(f"<{asset['url']}>; rel=preload; as={destination}")
+        else:
+            links.append(f"<{asset['url']}>; rel=prefetch")
+
+    return ", ".join(links)
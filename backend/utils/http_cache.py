@@ -0,0 +1,83 @@
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Set
+
+import brotli
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+
+
+@dataclass(frozen=True)
+class PrecompressedPayload:
+    """A JSON response body serialized and compressed once, ready to serve."""
+
+    body: bytes
+    gzip_body: bytes
+    brotli_body: bytes
+    etag: str
+
+    @classmethod
+    def build(cls, content: Any) -> "PrecompressedPayload":
+        body = json.dumps(
+            jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+        return cls(
+            body=body,
+            gzip_body=gzip.compress(body, compresslevel=9, mtime=0),
+            brotli_body=brotli.compress(body),
+            etag=f'"{hashlib.sha256(body).hexdigest()}"',
+        )
+
+
+def _accepted_encodings(accept_encoding: str) -> Set[str]:
+    encodings = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+def _encoded_etag(etag: str, encoding: str | None) -> str:
+    # Strong validators differ per content coding, the identity body keeps the
+    # plain hash
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # Any coding of the same body is still current
+    etags = {_encoded_etag(etag, encoding) for encoding in (None, "gzip", "br")}
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") in etags:
+            return True
+    return False
+
+
+def payload_response(request: Request, payload: PrecompressedPayload) -> Response:
+    encodings = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    body, encoding = payload.body, None
+    if "br" in encodings:
+        body, encoding = payload.brotli_body, "br"
+    elif "gzip" in encodings:
+        body, encoding = payload.gzip_body, "gzip"
+
+    # Clients revalidate on every load, unchanged content costs a 304
+    headers = {
+        "ETag": _encoded_etag(payload.etag, encoding),
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, payload.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
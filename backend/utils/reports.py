@@ -1,30 +1,58 @@
-import io
+import asyncio
+import tempfile
+from typing import IO, Any, AsyncIterator, Iterable, List
 
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
 from openpyxl.utils import get_column_letter
 
+# Reports larger than this are spooled to disk instead of memory
+REPORT_SPOOL_MAX_SIZE = 1024 * 1024
+REPORT_CHUNK_SIZE = 64 * 1024
 
-async def generate_report(headers, report_data, title):
-    wb = Workbook()
-    ws = wb.active
-    if not ws:
-        return None
-
-    ws.title = title
 
-    ws.append(headers)
+def write_report(
+    headers: List[str], report_data: Iterable[List[Any]], title: str, file: IO[bytes]
+):
+    # Write-only workbooks flush each row as it is appended, so memory use does
+    # not grow with the number of rows
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
 
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num, value=header)
-        cell.font = cell.font.copy(bold=True)
+    for col_num in range(1, len(headers) + 1):
         ws.column_dimensions[get_column_letter(col_num)].width = 18
 
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = Font(bold=True)
+        header_cells.append(cell)
+    ws.append(header_cells)
+
     for row_data in report_data:
         ws.append(row_data)
 
-    # 4. Save the workbook to a BytesIO object (in-memory file)
-    excel_stream = io.BytesIO()
-    wb.save(excel_stream)
-    excel_stream.seek(0)  # Rewind the stream to the beginning
+    wb.save(file)
+
+
+async def stream_report(file: IO[bytes]) -> AsyncIterator[bytes]:
+    try:
+        while chunk := await asyncio.to_thread(file.read, REPORT_CHUNK_SIZE):
+            yield chunk
+    finally:
+        file.close()
+
+
+async def generate_report(headers, report_data, title):
+    excel_file = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_SIZE)
+    try:
+        # Building the workbook is CPU bound, keep it off the event loop
+        await asyncio.to_thread(write_report, headers, report_data, title, excel_file)
+    except Exception:
+        excel_file.close()
+        raise
+
+    excel_file.seek(0)  # Rewind the file to the beginning
 
-    return excel_stream
+    return stream_report(excel_file)
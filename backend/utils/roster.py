@@ -0,0 +1,61 @@
+import csv
+import io
+from typing import Dict, List, Tuple
+
+from fastapi import HTTPException, status
+from openpyxl import load_workbook
+
+ROSTER_COLUMNS = ["first_name", "last_name", "email", "password"]
+
+
+def _normalize_header(value) -> str:
+    return str(value or "").strip().lower().replace(" ", "_")
+
+
+def _rows_to_dicts(rows: List[List]) -> List[Tuple[int, Dict[str, str]]]:
+    if not rows:
+        return []
+
+    headers = [_normalize_header(header) for header in rows[0]]
+    missing = [column for column in ROSTER_COLUMNS if column not in headers]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Missing roster columns: {', '.join(missing)}",
+        )
+
+    # Row numbers match the spreadsheet, the header being row 1
+    records = []
+    for row_number, row in enumerate(rows[1:], start=2):
+        if not any(str(cell or "").strip() for cell in row):
+            continue
+        record = dict(zip(headers, row))
+        records.append(
+            (
+                row_number,
+                {
+                    column: str(record.get(column) or "").strip()
+                    for column in ROSTER_COLUMNS
+                },
+            )
+        )
+    return records
+
+
+def parse_roster(filename: str, content: bytes) -> List[Tuple[int, Dict[str, str]]]:
+    if filename.lower().endswith(".csv"):
+        text = content.decode("utf-8-sig")
+        return _rows_to_dicts(list(csv.reader(io.StringIO(text))))
+
+    if filename.lower().endswith(".xlsx"):
+        wb = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+        try:
+            ws = wb.worksheets[0]
+            return _rows_to_dicts([list(row) for row in ws.iter_rows(values_only=True)])
+        finally:
+            wb.close()
+
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Roster must be a .csv or .xlsx file",
+    )